@@ -20,6 +20,47 @@ def get_data():
                     "type": "doctype",
                     "name": "RMC Raw Materials",
                     "label": _("RMC Raw Materials")
+                },
+                {
+                    "type": "doctype",
+                    "name": "RMC Status SLA",
+                    "label": _("RMC Status SLA"),
+                    "description": _("Alert thresholds per company, plant and status")
+                },
+                {
+                    "type": "doctype",
+                    "name": "RMC Status Transition",
+                    "label": _("RMC Status Transition"),
+                    "description": _("History of production entry status changes")
+                },
+                {
+                    "type": "doctype",
+                    "name": "RMC Shift Posting",
+                    "label": _("RMC Shift Posting"),
+                    "description": _("Consolidated vouchers posted at shift close")
+                }
+            ]
+        },
+        {
+            "label": _("RMC Reports"),
+            "items": [
+                {
+                    "type": "doctype",
+                    "name": "RMC Daily Production Summary",
+                    "label": _("RMC Daily Production Summary")
+                },
+                {
+                    "type": "report",
+                    "is_query_report": True,
+                    "name": "RMC Raw Material Variance",
+                    "doctype": "RMC Production Entry",
+                    "label": _("RMC Raw Material Variance")
+                },
+                {
+                    "type": "doctype",
+                    "name": "RMC Stage Timing",
+                    "label": _("RMC Stage Timing"),
+                    "description": _("Hourly latency of instrumented production entry stages")
                 }
             ]
         }
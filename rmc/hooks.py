@@ -86,6 +86,8 @@ fixtures = ["Custom Field", "Property Setter", "Client Script", "Custom Script",
 # before_install = "rmc.install.before_install"
 # after_install = "rmc.install.after_install"
 
+after_install = "rmc.install.after_install"
+
 # Uninstallation
 # ------------
 
@@ -146,6 +148,28 @@ fixtures = ["Custom Field", "Property Setter", "Client Script", "Custom Script",
 # 	}
 # }
 
+doc_events = {
+	"Company": {
+		"on_update": [
+			"erpnext.stock.doctype.rmc_production_entry.utils.provision_company_accounts",
+			"erpnext.stock.doctype.rmc_production_entry.utils.clear_company_rmc_context"
+		],
+		"on_trash": "erpnext.stock.doctype.rmc_production_entry.utils.clear_company_rmc_context",
+		"after_rename": "erpnext.stock.doctype.rmc_production_entry.utils.clear_company_rmc_context"
+	},
+	"Account": {
+		"on_update": "erpnext.stock.doctype.rmc_production_entry.utils.clear_company_rmc_context",
+		"on_trash": "erpnext.stock.doctype.rmc_production_entry.utils.clear_company_rmc_context",
+		"after_rename": "erpnext.stock.doctype.rmc_production_entry.utils.clear_company_rmc_context"
+	},
+	"BOM": {
+		"on_update": "erpnext.stock.doctype.rmc_production_entry.utils.clear_bom_lines_cache",
+		"on_update_after_submit": "erpnext.stock.doctype.rmc_production_entry.utils.clear_bom_lines_cache",
+		"on_cancel": "erpnext.stock.doctype.rmc_production_entry.utils.clear_bom_lines_cache",
+		"on_trash": "erpnext.stock.doctype.rmc_production_entry.utils.clear_bom_lines_cache"
+	}
+}
+
 # Scheduled Tasks
 # ---------------
 
@@ -167,6 +191,21 @@ fixtures = ["Custom Field", "Property Setter", "Client Script", "Custom Script",
 # 	],
 # }
 
+scheduler_events = {
+	"all": [
+		"erpnext.stock.doctype.rmc_production_entry.posting_queue.process_posting_queue",
+		"erpnext.stock.doctype.rmc_production_entry.aging.notify_sla_breaches"
+	],
+	"daily": [
+		"erpnext.stock.doctype.rmc_production_entry.dispatch_dashboard.reconcile_dispatch_counters",
+		"erpnext.stock.doctype.rmc_daily_production_summary.rmc_daily_production_summary.compact_daily_summary"
+	],
+	"hourly": [
+		"erpnext.stock.doctype.rmc_production_entry.instrumentation.rollup_samples",
+		"erpnext.stock.doctype.rmc_shift_posting.rmc_shift_posting.close_due_shifts"
+	]
+}
+
 # Testing
 # -------
 
@@ -200,11 +239,15 @@ fixtures = ["Custom Field", "Property Setter", "Client Script", "Custom Script",
 # before_request = ["rmc.utils.before_request"]
 # after_request = ["rmc.utils.after_request"]
 
+after_request = ["erpnext.stock.doctype.rmc_production_entry.instrumentation.flush_samples"]
+
 # Job Events
 # ----------
 # before_job = ["rmc.utils.before_job"]
 # after_job = ["rmc.utils.after_job"]
 
+after_job = ["erpnext.stock.doctype.rmc_production_entry.instrumentation.flush_samples"]
+
 # User Data Protection
 # --------------------
 
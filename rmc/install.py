@@ -0,0 +1,4 @@
+from erpnext.stock.doctype.rmc_production_entry.utils import provision_accounts
+
+def after_install():
+    provision_accounts()
@@ -0,0 +1,6 @@
+import frappe
+
+def execute():
+    # Cancelling an RMC Production Entry looks up its Stock Entries by this link
+    if frappe.db.has_column("Stock Entry", "rmc_production_entry"):
+        frappe.db.add_index("Stock Entry", ["rmc_production_entry"])
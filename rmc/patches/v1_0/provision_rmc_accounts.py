@@ -0,0 +1,5 @@
+from erpnext.stock.doctype.rmc_production_entry.utils import provision_accounts
+
+def execute():
+    # Existing companies; new ones are provisioned when the Company is saved
+    provision_accounts()
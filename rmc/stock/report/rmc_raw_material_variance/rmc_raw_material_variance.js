@@ -0,0 +1,63 @@
+// For license information, please see license.txt
+
+frappe.query_reports["RMC Raw Material Variance"] = {
+    filters: [
+        {
+            fieldname: "company",
+            label: __("Company"),
+            fieldtype: "Link",
+            options: "Company",
+            default: frappe.defaults.get_user_default("Company"),
+            reqd: 1
+        },
+        {
+            fieldname: "from_date",
+            label: __("From Date"),
+            fieldtype: "Date",
+            default: frappe.datetime.add_months(frappe.datetime.get_today(), -3),
+            reqd: 1
+        },
+        {
+            fieldname: "to_date",
+            label: __("To Date"),
+            fieldtype: "Date",
+            default: frappe.datetime.get_today(),
+            reqd: 1
+        },
+        {
+            fieldname: "period",
+            label: __("Period"),
+            fieldtype: "Select",
+            options: ["Daily", "Weekly", "Monthly", "Quarterly"],
+            default: "Monthly",
+            reqd: 1
+        },
+        {
+            fieldname: "plant",
+            label: __("Plant"),
+            fieldtype: "Link",
+            options: "Warehouse"
+        },
+        {
+            fieldname: "rmc_grade",
+            label: __("RMC Grade"),
+            fieldtype: "Link",
+            options: "Item",
+            get_query: () => ({ filters: { item_group: "RMC" } })
+        },
+        {
+            fieldname: "item_code",
+            label: __("Raw Material"),
+            fieldtype: "Link",
+            options: "Item"
+        }
+    ],
+
+    formatter: function(value, row, column, data, default_formatter) {
+        value = default_formatter(value, row, column, data);
+        if (column.fieldname === "variance_percent" && data && Math.abs(data.variance_percent) > 5) {
+            value = `<span style="color: ${data.variance_percent > 0 ? "red" : "green"}">${value}</span>`;
+        }
+        return value;
+    }
+};
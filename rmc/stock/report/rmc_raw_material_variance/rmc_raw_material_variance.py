@@ -0,0 +1,205 @@
+import frappe
+import hashlib
+import json
+from frappe import _
+from frappe.utils import date_diff, flt, getdate
+
+# Ranges longer than this are aggregated in memory, LARGE_RANGE_CHUNK_SIZE entries per query
+LARGE_RANGE_DAYS = 366
+LARGE_RANGE_CHUNK_SIZE = 20000
+REPORT_CACHE_TTL = 5 * 60
+
+PERIOD_EXPRESSIONS = {
+    "Daily": "entry.production_date",
+    "Weekly": "DATE_SUB(entry.production_date, INTERVAL WEEKDAY(entry.production_date) DAY)",
+    "Monthly": "DATE_FORMAT(entry.production_date, '%%Y-%%m-01')",
+    "Quarterly": "MAKEDATE(YEAR(entry.production_date), 1) + INTERVAL QUARTER(entry.production_date) - 1 QUARTER"
+}
+
+GROUP_FIELDS = ["period", "plant", "rmc_grade", "item_code"]
+VALUE_FIELDS = ["estimated_qty", "actual_qty", "estimated_cost", "actual_cost"]
+SUM_FIELDS = ["tickets", *VALUE_FIELDS]
+
+def execute(filters=None):
+    filters = frappe._dict(filters or {})
+    validate_filters(filters)
+    return get_columns(), get_data(filters)
+
+def validate_filters(filters):
+    if not filters.company:
+        frappe.throw(_("Company is required"))
+    if not filters.from_date or not filters.to_date:
+        frappe.throw(_("From Date and To Date are required"))
+    if getdate(filters.from_date) > getdate(filters.to_date):
+        frappe.throw(_("From Date cannot be after To Date"))
+    if (filters.period or "Monthly") not in PERIOD_EXPRESSIONS:
+        frappe.throw(_("Invalid period {0}").format(filters.period))
+
+def get_columns():
+    return [
+        {"label": _("Period"), "fieldname": "period", "fieldtype": "Date", "width": 100},
+        {"label": _("Plant"), "fieldname": "plant", "fieldtype": "Link", "options": "Warehouse", "width": 150},
+        {"label": _("RMC Grade"), "fieldname": "rmc_grade", "fieldtype": "Link", "options": "Item", "width": 120},
+        {"label": _("Raw Material"), "fieldname": "item_code", "fieldtype": "Link", "options": "Item", "width": 150},
+        {"label": _("Tickets"), "fieldname": "tickets", "fieldtype": "Int", "width": 80},
+        {"label": _("Estimated Qty"), "fieldname": "estimated_qty", "fieldtype": "Float", "precision": 3, "width": 120},
+        {"label": _("Actual Qty"), "fieldname": "actual_qty", "fieldtype": "Float", "precision": 3, "width": 120},
+        {"label": _("Qty Variance"), "fieldname": "variance_qty", "fieldtype": "Float", "precision": 3, "width": 120},
+        {"label": _("Variance %"), "fieldname": "variance_percent", "fieldtype": "Percent", "width": 100},
+        {"label": _("Estimated Cost"), "fieldname": "estimated_cost", "fieldtype": "Currency", "width": 130},
+        {"label": _("Actual Cost"), "fieldname": "actual_cost", "fieldtype": "Currency", "width": 130},
+        {"label": _("Cost Variance"), "fieldname": "cost_variance", "fieldtype": "Currency", "width": 130}
+    ]
+
+def get_data(filters):
+    """Aggregated variance rows, cached per filter set for a few minutes"""
+    cache_key = "rmc_raw_material_variance|" + hashlib.md5(
+        json.dumps(filters, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+    data = frappe.cache().get_value(cache_key)
+    if data is None:
+        if date_diff(filters.to_date, filters.from_date) > LARGE_RANGE_DAYS:
+            data = get_large_range_data(filters)
+        else:
+            data = get_grouped_rows(filters, filters.from_date, filters.to_date)
+        data = add_variances(data)
+        frappe.cache().set_value(cache_key, data, expires_in_sec=REPORT_CACHE_TTL)
+
+    return data
+
+def get_grouped_rows(filters, from_date, to_date):
+    """One grouped query over the child table joined to submitted entries"""
+    conditions = ""
+    for field, column in (("plant", "entry.source_warehouse"), ("rmc_grade", "entry.rmc_grade"), ("item_code", "item.item_code")):
+        if filters.get(field):
+            conditions += f" AND {column} = %({field})s"
+
+    period = PERIOD_EXPRESSIONS[filters.period or "Monthly"]
+    return frappe.db.sql(f"""
+        SELECT
+            {period} AS period,
+            entry.source_warehouse AS plant,
+            entry.rmc_grade,
+            item.item_code,
+            COUNT(DISTINCT entry.name) AS tickets,
+            SUM(item.estimated_qty) AS estimated_qty,
+            SUM(item.qty) AS actual_qty,
+            SUM(item.estimated_qty * item.rate) AS estimated_cost,
+            SUM(item.amount) AS actual_cost
+        FROM `tabRMC Raw Materials` item
+        INNER JOIN `tabRMC Production Entry` entry
+            ON entry.name = item.parent AND item.parenttype = 'RMC Production Entry'
+        WHERE entry.docstatus = 1
+            AND entry.company = %(company)s
+            AND entry.production_date BETWEEN %(from_date)s AND %(to_date)s
+            {conditions}
+        GROUP BY period, plant, entry.rmc_grade, item.item_code
+    """, dict(filters, from_date=from_date, to_date=to_date), as_dict=1)
+
+def get_large_range_data(filters):
+    """Aggregate a long range from un-grouped child rows, a chunk of entries at a time.
+
+    Each chunk is grouped with a vectorized pandas groupby when pandas is
+    installed. A chunk holds every row of its entries, so distinct ticket
+    counts of different chunks never share an entry and add up exactly.
+    """
+    partials = []
+    after = ""
+    while True:
+        rows = get_raw_rows(filters, after)
+        if not rows:
+            break
+        after = rows[-1].entry
+        partials.extend(aggregate_rows([row for row in rows if row.item_code]))
+
+    return combine_rows(partials)
+
+def get_raw_rows(filters, after):
+    """Child rows of the next LARGE_RANGE_CHUNK_SIZE entries after `after`, ordered by entry"""
+    entry_conditions = ""
+    for field, column in (("plant", "source_warehouse"), ("rmc_grade", "rmc_grade")):
+        if filters.get(field):
+            entry_conditions += f" AND {column} = %({field})s"
+    item_condition = " AND item.item_code = %(item_code)s" if filters.get("item_code") else ""
+
+    period = PERIOD_EXPRESSIONS[filters.period or "Monthly"]
+    # Entries without matching rows still come back, so the chunk's last entry is always known
+    return frappe.db.sql(f"""
+        SELECT
+            entry.name AS entry,
+            {period} AS period,
+            entry.source_warehouse AS plant,
+            entry.rmc_grade,
+            item.item_code,
+            item.estimated_qty,
+            item.qty AS actual_qty,
+            item.estimated_qty * item.rate AS estimated_cost,
+            item.amount AS actual_cost
+        FROM (
+            SELECT name, production_date, source_warehouse, rmc_grade
+            FROM `tabRMC Production Entry`
+            WHERE docstatus = 1
+                AND company = %(company)s
+                AND production_date BETWEEN %(from_date)s AND %(to_date)s
+                AND name > %(after)s
+                {entry_conditions}
+            ORDER BY name
+            LIMIT %(limit)s
+        ) entry
+        LEFT JOIN `tabRMC Raw Materials` item
+            ON item.parent = entry.name AND item.parenttype = 'RMC Production Entry' {item_condition}
+        ORDER BY entry.name
+    """, dict(filters, after=after, limit=LARGE_RANGE_CHUNK_SIZE), as_dict=1)
+
+def aggregate_rows(rows):
+    """Group child rows by GROUP_FIELDS, counting distinct entries as tickets"""
+    if not rows:
+        return []
+
+    try:
+        import pandas as pd
+    except ImportError:
+        groups = {}
+        for row in rows:
+            key = tuple(row[field] for field in GROUP_FIELDS)
+            group = groups.setdefault(key, frappe._dict(entries=set(), rows=[]))
+            group.entries.add(row.entry)
+            group.rows.append(row)
+        return [
+            frappe._dict(
+                zip(GROUP_FIELDS, key, strict=True),
+                tickets=len(group.entries),
+                **{field: sum(flt(row[field]) for row in group.rows) for field in VALUE_FIELDS}
+            )
+            for key, group in groups.items()
+        ]
+
+    frame = pd.DataFrame.from_records(rows, columns=["entry", *GROUP_FIELDS, *VALUE_FIELDS])
+    frame[VALUE_FIELDS] = frame[VALUE_FIELDS].fillna(0).astype(float)
+    grouped = frame.groupby(GROUP_FIELDS, as_index=False, dropna=False).agg(
+        tickets=("entry", "nunique"),
+        **{field: (field, "sum") for field in VALUE_FIELDS}
+    )
+    return [frappe._dict(row) for row in grouped.to_dict("records")]
+
+def combine_rows(partials):
+    """Add up partial aggregates that share the same GROUP_FIELDS"""
+    combined = {}
+    for row in partials:
+        key = tuple(row[field] for field in GROUP_FIELDS)
+        total = combined.setdefault(
+            key, frappe._dict(zip(GROUP_FIELDS, key, strict=True), **{field: 0 for field in SUM_FIELDS})
+        )
+        for field in SUM_FIELDS:
+            total[field] += flt(row[field])
+    return list(combined.values())
+
+def add_variances(rows):
+    for row in rows:
+        row.tickets = int(row.tickets or 0)
+        row.variance_qty = flt(row.actual_qty) - flt(row.estimated_qty)
+        row.variance_percent = row.variance_qty / flt(row.estimated_qty) * 100 if flt(row.estimated_qty) else 0
+        row.cost_variance = flt(row.actual_cost) - flt(row.estimated_cost)
+
+    return sorted(rows, key=lambda d: (str(d.period), d.plant or "", d.rmc_grade or "", d.item_code or ""))
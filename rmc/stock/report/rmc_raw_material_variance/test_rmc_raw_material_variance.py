@@ -0,0 +1,42 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from erpnext.stock.report.rmc_raw_material_variance.rmc_raw_material_variance import (
+    aggregate_rows,
+    combine_rows
+)
+
+class TestRMCRawMaterialVariance(FrappeTestCase):
+    def test_combine_rows(self):
+        combined = combine_rows([
+            {"period": "2026-01-01", "plant": "Plant 1", "rmc_grade": "M25", "item_code": "Cement", "tickets": 2,
+                "estimated_qty": 100, "actual_qty": 105, "estimated_cost": 800, "actual_cost": 840},
+            {"period": "2026-01-01", "plant": "Plant 1", "rmc_grade": "M25", "item_code": "Cement", "tickets": 3,
+                "estimated_qty": 150, "actual_qty": 148.5, "estimated_cost": 1200, "actual_cost": None},
+            {"period": "2026-01-01", "plant": None, "rmc_grade": "M25", "item_code": "Cement", "tickets": 1,
+                "estimated_qty": 50, "actual_qty": 50, "estimated_cost": 400, "actual_cost": 400}
+        ])
+
+        self.assertEqual(len(combined), 2)
+        self.assertEqual(combined[0].tickets, 5)
+        self.assertEqual(combined[0].estimated_qty, 250)
+        self.assertEqual(combined[0].actual_qty, 253.5)
+        self.assertEqual(combined[0].actual_cost, 840)
+        self.assertIsNone(combined[1].plant)
+        self.assertEqual(combine_rows([]), [])
+
+    def test_tickets_of_chunks_add_up(self):
+        rows = [
+            frappe._dict(entry="RMC-1", period="2026-01-01", plant="Plant 1", rmc_grade="M25", item_code="Cement",
+                estimated_qty=100, actual_qty=104, estimated_cost=800, actual_cost=832),
+            frappe._dict(entry="RMC-1", period="2026-01-01", plant="Plant 1", rmc_grade="M25", item_code="Cement",
+                estimated_qty=10, actual_qty=10, estimated_cost=80, actual_cost=80),
+            frappe._dict(entry="RMC-2", period="2026-01-01", plant="Plant 1", rmc_grade="M25", item_code="Cement",
+                estimated_qty=100, actual_qty=96, estimated_cost=800, actual_cost=768)
+        ]
+
+        # Every row of an entry lands in the same chunk
+        combined = combine_rows(aggregate_rows(rows[:2]) + aggregate_rows(rows[2:]))
+
+        self.assertEqual(len(combined), 1)
+        self.assertEqual(combined[0].tickets, 2)
+        self.assertEqual(combined[0].actual_qty, 210)
@@ -0,0 +1,136 @@
+import frappe
+import hashlib
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import add_days, flt, getdate, now, nowdate
+
+# Days re-aggregated from source entries by the nightly compaction
+COMPACTION_DAYS = 7
+REBUILD_BATCH_SIZE = 1000
+
+class RMCDailyProductionSummary(Document):
+    """Pre-aggregated production per day, company, plant and RMC grade"""
+    pass
+
+def get_summary_name(production_date, company, plant, rmc_grade):
+    # Deterministic so the primary key doubles as the upsert key
+    key = f"{getdate(production_date)}|{company}|{plant}|{rmc_grade}"
+    return f"{getdate(production_date)}-{hashlib.md5(key.encode()).hexdigest()[:10]}"
+
+def update_daily_summary(entry, sign=1):
+    """Add (sign=1) or remove (sign=-1) a production entry from its daily summary row"""
+    timestamp = now()
+    user = frappe.session.user
+    frappe.db.sql("""
+        INSERT INTO `tabRMC Daily Production Summary` (
+            name, creation, modified, owner, modified_by, docstatus, idx,
+            production_date, company, plant, rmc_grade, ticket_count, total_quantity,
+            total_raw_material_cost, total_mixing_cost, total_cost, avg_per_unit_cost
+        )
+        VALUES (
+            %(name)s, %(timestamp)s, %(timestamp)s, %(user)s, %(user)s, 0, 0,
+            %(production_date)s, %(company)s, %(plant)s, %(rmc_grade)s, %(tickets)s, %(quantity)s,
+            %(raw_material_cost)s, %(mixing_cost)s, %(total_cost)s, %(per_unit_cost)s
+        )
+        ON DUPLICATE KEY UPDATE
+            ticket_count = ticket_count + VALUES(ticket_count),
+            total_quantity = total_quantity + VALUES(total_quantity),
+            total_raw_material_cost = total_raw_material_cost + VALUES(total_raw_material_cost),
+            total_mixing_cost = total_mixing_cost + VALUES(total_mixing_cost),
+            total_cost = total_cost + VALUES(total_cost),
+            avg_per_unit_cost = IF(total_quantity = 0, 0, total_cost / total_quantity),
+            modified = VALUES(modified),
+            modified_by = VALUES(modified_by)
+    """, {
+        "name": get_summary_name(entry.production_date, entry.company, entry.source_warehouse, entry.rmc_grade),
+        "timestamp": timestamp,
+        "user": user,
+        "production_date": entry.production_date,
+        "company": entry.company,
+        "plant": entry.source_warehouse,
+        "rmc_grade": entry.rmc_grade,
+        "tickets": sign,
+        "quantity": sign * flt(entry.quantity),
+        "raw_material_cost": sign * flt(entry.total_raw_material_cost),
+        "mixing_cost": sign * flt(entry.total_mixing_cost),
+        "total_cost": sign * flt(entry.total_cost),
+        "per_unit_cost": flt(entry.per_unit_cost) if sign > 0 else 0
+    })
+
+def rebuild_daily_summary(from_date, to_date):
+    """Recompute summary rows for a date range from submitted production entries.
+
+    Rows are upserted in place, like `update_daily_summary`, so a ticket
+    submitted during the rebuild cannot collide with a deleted-and-reinserted
+    row. The entries are aggregated with a locking read: a submit or cancel in
+    the range either commits before it, and is counted, or waits until the
+    rebuild commits and then applies its increment on top. Rows left without
+    any submitted entry are removed afterwards.
+    """
+    timestamp = now()
+    user = frappe.session.user
+
+    rows = frappe.db.sql("""
+        SELECT
+            production_date, company, source_warehouse AS plant, rmc_grade,
+            COUNT(*) AS ticket_count, SUM(quantity) AS total_quantity,
+            SUM(total_raw_material_cost) AS total_raw_material_cost,
+            SUM(total_mixing_cost) AS total_mixing_cost, SUM(total_cost) AS total_cost
+        FROM `tabRMC Production Entry`
+        WHERE docstatus = 1 AND production_date BETWEEN %s AND %s
+        GROUP BY production_date, company, source_warehouse, rmc_grade
+        FOR UPDATE
+    """, (from_date, to_date), as_dict=1)
+
+    values = [
+        (
+            get_summary_name(row.production_date, row.company, row.plant, row.rmc_grade),
+            timestamp, timestamp, user, user, 0, 0,
+            row.production_date, row.company, row.plant, row.rmc_grade, row.ticket_count,
+            flt(row.total_quantity), flt(row.total_raw_material_cost), flt(row.total_mixing_cost),
+            flt(row.total_cost), flt(row.total_cost) / flt(row.total_quantity) if flt(row.total_quantity) else 0
+        )
+        for row in rows
+    ]
+
+    for start in range(0, len(values), REBUILD_BATCH_SIZE):
+        batch = values[start:start + REBUILD_BATCH_SIZE]
+        placeholders = ", ".join(["(" + ", ".join(["%s"] * len(batch[0])) + ")"] * len(batch))
+        frappe.db.sql(f"""
+            INSERT INTO `tabRMC Daily Production Summary` (
+                name, creation, modified, owner, modified_by, docstatus, idx,
+                production_date, company, plant, rmc_grade, ticket_count, total_quantity,
+                total_raw_material_cost, total_mixing_cost, total_cost, avg_per_unit_cost
+            )
+            VALUES {placeholders}
+            ON DUPLICATE KEY UPDATE
+                ticket_count = VALUES(ticket_count),
+                total_quantity = VALUES(total_quantity),
+                total_raw_material_cost = VALUES(total_raw_material_cost),
+                total_mixing_cost = VALUES(total_mixing_cost),
+                total_cost = VALUES(total_cost),
+                avg_per_unit_cost = VALUES(avg_per_unit_cost),
+                modified = VALUES(modified),
+                modified_by = VALUES(modified_by)
+        """, [value for row in batch for value in row])
+
+    frappe.db.sql("""
+        DELETE FROM `tabRMC Daily Production Summary`
+        WHERE production_date BETWEEN %s AND %s AND name NOT IN %s
+    """, (from_date, to_date, [row[0] for row in values] or [""]))
+
+def compact_daily_summary():
+    """Nightly job: re-aggregate recent closed days from source and drop emptied rows"""
+    # Today is left to the incremental updates; its entries are still being submitted
+    today = nowdate()
+    rebuild_daily_summary(add_days(today, -COMPACTION_DAYS), add_days(today, -1))
+    frappe.db.sql("DELETE FROM `tabRMC Daily Production Summary` WHERE ticket_count <= 0")
+
+@frappe.whitelist()
+def rebuild_summary(from_date, to_date):
+    """Rebuild the daily summary for a date range"""
+    frappe.only_for("Stock Manager")
+    if getdate(from_date) > getdate(to_date):
+        frappe.throw(_("From Date cannot be after To Date"))
+
+    rebuild_daily_summary(getdate(from_date), getdate(to_date))
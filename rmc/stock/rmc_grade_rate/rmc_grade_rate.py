@@ -1,13 +1,95 @@
 import frappe
+from bisect import bisect_right
 from frappe import _
 from frappe.model.document import Document
-from frappe.utils import getdate
+from frappe.utils import add_days, cint, flt, getdate, now
+
+# Redis key holding the current rate table version. Every worker keeps its own
+# copy of the rate schedules and drops it as soon as this version moves on.
+RATE_CACHE_VERSION_KEY = "rmc_grade_rate_version"
+
+# site -> {"version": str, "schedules": {(rmc_grade, warehouse): RateSchedule}}
+_rate_tables = {}
+
+# To Date given to rate card rows that are valid until further notice
+OPEN_RATE_END_DATE = "2099-12-31"
+
+
+class RateSchedule:
+    """Sorted, non-overlapping rate intervals for one RMC grade and plant"""
+
+    __slots__ = ("from_dates", "rates", "to_dates")
+
+    def __init__(self, rows):
+        rows = sorted(rows, key=lambda d: d[0])
+        self.from_dates = [getdate(d[0]) for d in rows]
+        self.to_dates = [getdate(d[1]) for d in rows]
+        self.rates = [d[2] for d in rows]
+
+    def lookup(self, date):
+        """Return the rate whose interval covers `date`, or None"""
+        date = getdate(date)
+        idx = bisect_right(self.from_dates, date) - 1
+        if idx >= 0 and self.to_dates[idx] >= date:
+            return self.rates[idx]
+
+
+def get_rate_table_version():
+    version = frappe.cache().get_value(RATE_CACHE_VERSION_KEY)
+    if not version:
+        version = frappe.generate_hash(length=10)
+        frappe.cache().set_value(RATE_CACHE_VERSION_KEY, version)
+    return version
+
+
+def get_rate_schedule(rmc_grade, warehouse):
+    """Get the cached rate schedule for an RMC grade in a plant"""
+    version = get_rate_table_version()
+    table = _rate_tables.get(frappe.local.site)
+    if not table or table["version"] != version:
+        table = {"version": version, "schedules": {}}
+        _rate_tables[frappe.local.site] = table
+
+    key = (rmc_grade, warehouse)
+    schedule = table["schedules"].get(key)
+    if schedule is None:
+        rows = frappe.get_all(
+            "RMC Grade Rate",
+            filters={"rmc_grade": rmc_grade, "warehouse": warehouse, "disabled": 0},
+            fields=["from_date", "to_date", "rate"],
+            order_by="from_date asc",
+            as_list=True
+        )
+        schedule = table["schedules"][key] = RateSchedule(rows)
+
+    return schedule
+
+
+def clear_rate_cache():
+    """Invalidate rate schedules in every worker of the current site and return the new version"""
+    version = frappe.generate_hash(length=10)
+    _rate_tables.pop(frappe.local.site, None)
+    frappe.cache().set_value(RATE_CACHE_VERSION_KEY, version)
+    return version
+
 
 class RMCGradeRate(Document):
     def validate(self):
         self.validate_dates()
         self.validate_duplicate_rate()
 
+    def on_update(self):
+        self.clear_rate_cache()
+
+    def on_trash(self):
+        self.clear_rate_cache()
+
+    def clear_rate_cache(self):
+        clear_rate_cache()
+        # Workers that rebuilt their schedules before this transaction committed
+        # would otherwise keep serving the old rate.
+        frappe.db.after_commit.add(clear_rate_cache)
+
     def validate_dates(self):
         """Ensure to_date is after from_date"""
         if self.from_date and self.to_date and getdate(self.from_date) > getdate(self.to_date):
@@ -15,27 +97,24 @@ class RMCGradeRate(Document):
 
     def validate_duplicate_rate(self):
         """Check for overlapping rate periods"""
+        # Two periods overlap when each starts on or before the other ends
         existing_rates = frappe.db.sql("""
             SELECT name, from_date, to_date
             FROM `tabRMC Grade Rate`
             WHERE
                 rmc_grade = %s
                 AND warehouse = %s
-                AND name != %s
                 AND disabled = 0
-                AND ((from_date BETWEEN %s AND %s)
-                    OR (to_date BETWEEN %s AND %s)
-                    OR (from_date <= %s AND to_date >= %s))
+                AND from_date <= %s
+                AND to_date >= %s
+                AND name != %s
+            LIMIT 1
         """, (
             self.rmc_grade,
             self.warehouse,
-            self.name or "New RMC Grade Rate",
-            self.from_date,
             self.to_date,
             self.from_date,
-            self.to_date,
-            self.from_date,
-            self.to_date
+            self.name or "New RMC Grade Rate"
         ), as_dict=1)
 
         if existing_rates:
@@ -48,20 +127,15 @@ class RMCGradeRate(Document):
                 existing_rates[0].to_date
             ))
 
+    @staticmethod
+    def get_rate_schedule(rmc_grade, warehouse):
+        """Get all rate intervals of an RMC grade in a plant"""
+        return get_rate_schedule(rmc_grade, warehouse)
+
     @staticmethod
     def get_rate(rmc_grade, date, warehouse):
         """Get applicable mixing rate for given parameters"""
-        rate = frappe.db.get_value(
-            "RMC Grade Rate",
-            {
-                "rmc_grade": rmc_grade,
-                "warehouse": warehouse,
-                "from_date": ("<=", date),
-                "to_date": (">=", date),
-                "disabled": 0
-            },
-            "rate"
-        )
+        rate = get_rate_schedule(rmc_grade, warehouse).lookup(date) if date else None
 
         if not rate:
             frappe.throw(_(
@@ -69,3 +143,182 @@ class RMCGradeRate(Document):
             ).format(rmc_grade, warehouse, date))
 
         return rate
+
+def on_doctype_update():
+    # Serves both the overlap check and rate schedule loads
+    frappe.db.add_index("RMC Grade Rate", ["rmc_grade", "warehouse", "disabled", "from_date", "to_date"])
+
+def find_rate_overlaps(rates):
+    """Find overlapping periods among rate rows with a sort-and-sweep per grade and plant.
+
+    `rates` are dicts with rmc_grade, warehouse, from_date and to_date. Returns
+    (row, conflicting_row) pairs; each row is reported against the earlier
+    period it runs into.
+    """
+    groups = {}
+    for row in rates:
+        if row.get("disabled"):
+            continue
+        groups.setdefault((row.get("rmc_grade"), row.get("warehouse")), []).append(row)
+
+    overlaps = []
+    for rows in groups.values():
+        rows.sort(key=lambda d: (getdate(d.get("from_date")), getdate(d.get("to_date"))))
+        # Row reaching furthest into the future among those swept so far
+        furthest = None
+        for row in rows:
+            if furthest and getdate(row.get("from_date")) <= getdate(furthest.get("to_date")):
+                overlaps.append((row, furthest))
+            if not furthest or getdate(row.get("to_date")) > getdate(furthest.get("to_date")):
+                furthest = row
+
+    return overlaps
+
+def get_existing_rates(rates):
+    """Enabled rate rows of every (grade, plant) in `rates`, fetched in one query"""
+    pairs = {(d.get("rmc_grade"), d.get("warehouse")) for d in rates}
+    if not pairs:
+        return []
+
+    existing = frappe.db.sql("""
+        SELECT name, rmc_grade, warehouse, from_date, to_date, rate, disabled
+        FROM `tabRMC Grade Rate`
+        WHERE rmc_grade IN %(rmc_grades)s AND warehouse IN %(warehouses)s AND disabled = 0
+    """, {
+        "rmc_grades": list({d[0] for d in pairs}),
+        "warehouses": list({d[1] for d in pairs})
+    }, as_dict=1)
+
+    return [d for d in existing if (d.rmc_grade, d.warehouse) in pairs]
+
+@frappe.whitelist()
+def validate_rate_batch(rates):
+    """Check a batch of new rates for overlaps with each other and with saved rates"""
+    if isinstance(rates, str):
+        rates = frappe.parse_json(rates)
+
+    rates = [frappe._dict(d) for d in rates]
+    for row in rates:
+        if not row.from_date:
+            frappe.throw(_("From Date is required for {0} in Plant {1}").format(row.rmc_grade, row.warehouse))
+
+        # An empty To Date is open ended, as in import_rate_card
+        row.to_date = row.to_date or OPEN_RATE_END_DATE
+        if getdate(row.from_date) > getdate(row.to_date):
+            frappe.throw(_("To Date cannot be before From Date for {0} in Plant {1}").format(
+                row.rmc_grade, row.warehouse
+            ))
+
+    new_names = {d.name for d in rates if d.name}
+    existing = [d for d in get_existing_rates(rates) if d.name not in new_names]
+
+    return [
+        {
+            "rmc_grade": row.rmc_grade,
+            "warehouse": row.warehouse,
+            "from_date": row.from_date,
+            "to_date": row.to_date,
+            "conflicts_with": conflict.name or None,
+            "conflict_from_date": conflict.from_date,
+            "conflict_to_date": conflict.to_date
+        }
+        for row, conflict in find_rate_overlaps(existing + rates)
+    ]
+
+@frappe.whitelist()
+def import_rate_card(rates, close_open_rates=1):
+    """Import a full rate card in one pass.
+
+    Saved rates of every grade/plant in the card are fetched with one query.
+    Periods still running when a new rate starts are closed the day before
+    and the new rows are inserted in bulk. Bulk inserts skip the controller,
+    so the saved rates are checked for overlaps again after the insert, and
+    the cached rate schedules of every worker are invalidated on commit.
+    """
+    frappe.has_permission("RMC Grade Rate", "create", throw=True)
+    if isinstance(rates, str):
+        rates = frappe.parse_json(rates)
+
+    new_rates = []
+    for row in rates:
+        row = frappe._dict(row)
+        if not (row.rmc_grade and row.warehouse and row.from_date) or flt(row.rate) <= 0:
+            frappe.throw(_("RMC Grade, Plant, From Date and Rate are required for every rate card row"))
+
+        row.from_date = getdate(row.from_date)
+        row.to_date = getdate(row.to_date or OPEN_RATE_END_DATE)
+        if row.from_date > row.to_date:
+            frappe.throw(_("To Date cannot be before From Date for {0} in Plant {1}").format(
+                row.rmc_grade, row.warehouse
+            ))
+        new_rates.append(row)
+
+    if not new_rates:
+        return
+
+    throw_overlaps(find_rate_overlaps(new_rates))
+
+    # Earliest new start per grade/plant; saved periods running past it get closed
+    starts = {}
+    for row in new_rates:
+        key = (row.rmc_grade, row.warehouse)
+        starts[key] = min(starts.get(key, row.from_date), row.from_date)
+
+    existing = get_existing_rates(new_rates)
+    closed = {}
+    if cint(close_open_rates):
+        for row in existing:
+            start = starts[(row.rmc_grade, row.warehouse)]
+            if getdate(row.from_date) < start <= getdate(row.to_date):
+                row.to_date = closed[row.name] = add_days(start, -1)
+
+    throw_overlaps(find_rate_overlaps(existing + new_rates))
+
+    timestamp = now()
+    if closed:
+        frappe.has_permission("RMC Grade Rate", "write", throw=True)
+        cases = " ".join(["WHEN %s THEN %s"] * len(closed))
+        frappe.db.sql(f"""
+            UPDATE `tabRMC Grade Rate`
+            SET to_date = CASE name {cases} END, modified = %s, modified_by = %s
+            WHERE name IN %s
+        """, (
+            *[value for item in closed.items() for value in item],
+            timestamp,
+            frappe.session.user,
+            list(closed)
+        ))
+
+    fields = [
+        "name", "creation", "modified", "owner", "modified_by", "docstatus", "idx",
+        "rmc_grade", "warehouse", "from_date", "to_date", "rate", "disabled"
+    ]
+    frappe.db.bulk_insert("RMC Grade Rate", fields, [
+        (
+            frappe.generate_hash(length=10), timestamp, timestamp, frappe.session.user,
+            frappe.session.user, 0, 0, row.rmc_grade, row.warehouse, row.from_date,
+            row.to_date, flt(row.rate), 0
+        )
+        for row in new_rates
+    ])
+
+    # Dates were validated above; re-check overlaps against the saved rows, so a
+    # rate saved by someone else while the card was being built rolls the import back
+    throw_overlaps(find_rate_overlaps(get_existing_rates(new_rates)))
+
+    # Invalidate cached schedules now and again once the whole card is committed
+    clear_rate_cache()
+    frappe.db.after_commit.add(clear_rate_cache)
+
+    return {"inserted": len(new_rates), "closed": list(closed)}
+
+def throw_overlaps(overlaps):
+    if not overlaps:
+        return
+
+    frappe.throw(_("Overlapping rate periods:<br>{0}").format("<br>".join(
+        _("{0} in Plant {1}: {2} to {3} overlaps {4} to {5}").format(
+            row.rmc_grade, row.warehouse, row.from_date, row.to_date, conflict.from_date, conflict.to_date
+        )
+        for row, conflict in overlaps
+    )))
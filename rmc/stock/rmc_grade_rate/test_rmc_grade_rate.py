@@ -0,0 +1,55 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from erpnext.stock.doctype.rmc_grade_rate.rmc_grade_rate import (
+    OPEN_RATE_END_DATE,
+    RateSchedule,
+    find_rate_overlaps
+)
+
+class TestRMCGradeRate(FrappeTestCase):
+    def test_rate_schedule_lookup(self):
+        # Listed out of order; the schedule sorts its intervals
+        schedule = RateSchedule([
+            ("2026-02-10", OPEN_RATE_END_DATE, 120),
+            ("2026-01-01", "2026-01-31", 100)
+        ])
+
+        # Both ends of an interval are inclusive
+        self.assertEqual(schedule.lookup("2026-01-01"), 100)
+        self.assertEqual(schedule.lookup("2026-01-31"), 100)
+        self.assertEqual(schedule.lookup("2026-02-10"), 120)
+        self.assertEqual(schedule.lookup(OPEN_RATE_END_DATE), 120)
+
+        # Before the first interval, in the gap and after the open end
+        self.assertIsNone(schedule.lookup("2025-12-31"))
+        self.assertIsNone(schedule.lookup("2026-02-01"))
+        self.assertIsNone(schedule.lookup("2026-02-09"))
+        self.assertIsNone(schedule.lookup("2100-01-01"))
+
+        self.assertIsNone(RateSchedule([]).lookup("2026-01-01"))
+
+    def test_touching_rate_periods_overlap(self):
+        rates = [
+            frappe._dict(name="A", rmc_grade="M25", warehouse="Plant 1", from_date="2026-01-01", to_date="2026-01-31"),
+            frappe._dict(name="B", rmc_grade="M25", warehouse="Plant 1", from_date="2026-01-31", to_date="2026-02-28"),
+            frappe._dict(name="C", rmc_grade="M25", warehouse="Plant 1", from_date="2026-03-01", to_date="2026-03-31")
+        ]
+
+        # B starts on the day A ends; C starts the day after B ends
+        self.assertEqual([(row.name, conflict.name) for row, conflict in find_rate_overlaps(rates)], [("B", "A")])
+
+    def test_open_ended_rate_period_overlaps(self):
+        rates = [
+            frappe._dict(name="C", rmc_grade="M25", warehouse="Plant 1", from_date="2026-09-01", to_date="2026-09-30"),
+            frappe._dict(name="A", rmc_grade="M25", warehouse="Plant 1", from_date="2026-01-01", to_date=OPEN_RATE_END_DATE),
+            frappe._dict(name="B", rmc_grade="M25", warehouse="Plant 1", from_date="2026-06-01", to_date="2026-06-30"),
+            frappe._dict(name="D", rmc_grade="M25", warehouse="Plant 1", from_date="2026-06-01", to_date="2026-06-30",
+                disabled=1),
+            frappe._dict(name="E", rmc_grade="M25", warehouse="Plant 2", from_date="2026-06-01", to_date="2026-06-30")
+        ]
+
+        # Disabled rows and other plants are never compared
+        self.assertEqual(
+            [(row.name, conflict.name) for row, conflict in find_rate_overlaps(rates)],
+            [("B", "A"), ("C", "A")]
+        )
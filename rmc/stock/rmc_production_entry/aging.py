@@ -0,0 +1,124 @@
+import frappe
+from datetime import timedelta
+from frappe import _
+from frappe.utils import get_datetime, now_datetime, time_diff_in_hours
+from erpnext.stock.doctype.rmc_status_sla.rmc_status_sla import DEFAULT_ALERT_HOURS, get_alert_hours, get_sla_rules
+
+SLA_BREACH_EVENT = "rmc_sla_breach"
+SLA_NOTIFIED_CACHE_KEY = "rmc_sla_notified"
+
+def get_breached_entries(company=None, plant=None, workflow_state=None):
+    """Submitted entries that have been in their state longer than their SLA.
+
+    Uses one (workflow_state, status_changed_at) range scan per state, cut
+    off at the shortest threshold configured for that state; rows are then
+    checked against their own company/plant threshold.
+    """
+    rules = get_sla_rules()
+    current_time = now_datetime()
+    states = [workflow_state] if workflow_state else list(DEFAULT_ALERT_HOURS)
+
+    breached = []
+    for state in states:
+        thresholds = [hours for (rule_state, _company, _warehouse), hours in rules.items() if rule_state == state]
+        if state in DEFAULT_ALERT_HOURS:
+            thresholds.append(DEFAULT_ALERT_HOURS[state])
+        if not thresholds:
+            continue
+
+        conditions = ""
+        values = {
+            "workflow_state": state,
+            "cutoff": current_time - timedelta(hours=min(thresholds))
+        }
+        if company:
+            conditions += " AND company = %(company)s"
+            values["company"] = company
+        if plant:
+            conditions += " AND source_warehouse = %(plant)s"
+            values["plant"] = plant
+
+        rows = frappe.db.sql(f"""
+            SELECT
+                name, ticket_number, company, source_warehouse, destination_warehouse,
+                rmc_grade, quantity, lorry_number, driver_name, workflow_state, status_changed_at
+            FROM `tabRMC Production Entry`
+            WHERE workflow_state = %(workflow_state)s
+                AND status_changed_at < %(cutoff)s
+                AND docstatus = 1
+                {conditions}
+            ORDER BY status_changed_at
+        """, values, as_dict=1)
+
+        for row in rows:
+            row.hours = time_diff_in_hours(current_time, get_datetime(row.status_changed_at))
+            row.alert_hours = get_alert_hours(state, row.company, row.source_warehouse, rules=rules)
+            if row.alert_hours and row.hours > row.alert_hours:
+                breached.append(row)
+
+    return breached
+
+@frappe.whitelist()
+def get_sla_breaches(company=None, plant=None, workflow_state=None):
+    """Entries currently over their status SLA"""
+    frappe.has_permission("RMC Production Entry", "read", throw=True)
+    return get_breached_entries(company, plant, workflow_state)
+
+@frappe.whitelist()
+def get_alert_hours_map():
+    """Default and configured SLA thresholds, for computing indicators in the browser"""
+    return {
+        "defaults": DEFAULT_ALERT_HOURS,
+        "rules": [
+            {"workflow_state": state, "company": company, "warehouse": warehouse, "alert_hours": hours}
+            for (state, company, warehouse), hours in get_sla_rules().items()
+        ]
+    }
+
+def notify_sla_breaches():
+    """Scheduled job: push newly breached entries to desk users and Stock Managers"""
+    breached = get_breached_entries()
+    notified = frappe.cache().get_value(SLA_NOTIFIED_CACHE_KEY) or {}
+
+    # An entry is notified once per state change
+    current = {row.name: str(row.status_changed_at) for row in breached}
+    new_breaches = [row for row in breached if notified.get(row.name) != current[row.name]]
+    frappe.cache().set_value(SLA_NOTIFIED_CACHE_KEY, current)
+
+    if not new_breaches:
+        return
+
+    frappe.publish_realtime(
+        SLA_BREACH_EVENT,
+        {"entries": [
+            {
+                "name": row.name,
+                "workflow_state": row.workflow_state,
+                "hours": row.hours,
+                "alert_hours": row.alert_hours
+            }
+            for row in new_breaches
+        ]},
+        doctype="RMC Production Entry"
+    )
+
+    from frappe.desk.doctype.notification_log.notification_log import make_notification_logs
+
+    users = get_sla_recipients()
+    for row in new_breaches:
+        make_notification_logs({
+            "type": "Alert",
+            "document_type": "RMC Production Entry",
+            "document_name": row.name,
+            "subject": _("{0} ({1}) has been {2} for {3} hours").format(
+                row.name, row.lorry_number, row.workflow_state, frappe.utils.rounded(row.hours, 1)
+            )
+        }, users)
+
+def get_sla_recipients():
+    return frappe.get_all(
+        "Has Role",
+        filters={"role": "Stock Manager", "parenttype": "User", "parent": ("not in", ["Administrator", "Guest"])},
+        pluck="parent",
+        distinct=True
+    )
@@ -0,0 +1,144 @@
+import frappe
+import json
+from frappe import _
+from frappe.utils import cint, flt
+from erpnext.stock.stock_ledger import NegativeStockError
+from erpnext.stock.doctype.rmc_production_entry.utils import (
+    SHIFT_PENDING_STATUS,
+    get_conversion_factor,
+    get_item_details_map,
+    get_posting_schedule
+)
+
+# Submitted entries whose raw materials have not been issued from the plant yet
+UNPOSTED_STATUSES = ("Queued", SHIFT_PENDING_STATUS)
+
+def is_negative_stock_allowed():
+    return cint(frappe.db.get_single_value("Stock Settings", "allow_negative_stock"))
+
+def get_stock_shortfalls(materials, item_map=None):
+    """Raw material shortfalls of one or more tickets, their demand netted per item and plant.
+
+    `materials` are (entry, warehouse, item_code, qty, uom) rows. Bins are read
+    with one query; with deferred or shift posting, the demand of submitted entries
+    not yet posted is counted against the stock as well.
+    """
+    materials = [d for d in materials if d[2] and flt(d[3]) > 0]
+    if not materials:
+        return []
+
+    if item_map is None:
+        item_map = get_item_details_map([d[2] for d in materials])
+
+    demand = {}
+    entries = {}
+    for entry, warehouse, item_code, qty, uom in materials:
+        key = (item_code, warehouse)
+        demand[key] = demand.get(key, 0) + flt(qty) * get_conversion_factor(item_map.get(item_code), uom)
+        entries.setdefault(key, set()).add(entry)
+
+    item_codes = list({key[0] for key in demand})
+    warehouses = list({key[1] for key in demand})
+
+    stock = {}
+    skip = set()
+    for row in frappe.db.sql("""
+        SELECT item.name AS item_code, item.is_stock_item, item.allow_negative_stock,
+            bin.warehouse, bin.actual_qty
+        FROM `tabItem` item
+        LEFT JOIN `tabBin` bin ON bin.item_code = item.name AND bin.warehouse IN %(warehouses)s
+        WHERE item.name IN %(item_codes)s
+    """, {"item_codes": item_codes, "warehouses": warehouses}, as_dict=1):
+        if not row.is_stock_item or row.allow_negative_stock:
+            skip.add(row.item_code)
+        elif row.warehouse:
+            stock[(row.item_code, row.warehouse)] = flt(row.actual_qty)
+
+    pending = {}
+    if get_posting_schedule() != "Immediate":
+        pending = get_unposted_demand(item_codes, warehouses, {d[0] for d in materials}, item_map)
+
+    shortfalls = []
+    for (item_code, warehouse), required_qty in demand.items():
+        if item_code in skip:
+            continue
+
+        available_qty = stock.get((item_code, warehouse), 0) - pending.get((item_code, warehouse), 0)
+        if required_qty > available_qty:
+            shortfalls.append(frappe._dict(
+                item_code=item_code,
+                warehouse=warehouse,
+                required_qty=required_qty,
+                available_qty=available_qty,
+                shortage_qty=required_qty - available_qty,
+                entries=sorted(entries[(item_code, warehouse)])
+            ))
+
+    return sorted(shortfalls, key=lambda d: (d.warehouse, d.item_code))
+
+def get_unposted_demand(item_codes, warehouses, exclude, item_map):
+    """Stock UOM demand of submitted entries still waiting to be posted, per item and plant"""
+    rows = frappe.db.sql("""
+        SELECT rm.item_code, rm.uom, pe.source_warehouse AS warehouse, SUM(rm.qty) AS qty
+        FROM `tabRMC Production Entry` pe
+        INNER JOIN `tabRMC Raw Materials` rm
+            ON rm.parent = pe.name AND rm.parenttype = 'RMC Production Entry'
+        WHERE pe.docstatus = 1 AND pe.posting_status IN %(statuses)s
+            AND pe.source_warehouse IN %(warehouses)s AND rm.item_code IN %(item_codes)s
+            AND pe.name NOT IN %(exclude)s
+        GROUP BY rm.item_code, rm.uom, pe.source_warehouse
+    """, {
+        "statuses": UNPOSTED_STATUSES,
+        "warehouses": warehouses,
+        "item_codes": item_codes,
+        "exclude": list(exclude) or [""]
+    }, as_dict=1)
+
+    pending = {}
+    for row in rows:
+        key = (row.item_code, row.warehouse)
+        pending[key] = pending.get(key, 0) + flt(row.qty) * get_conversion_factor(item_map.get(row.item_code), row.uom)
+    return pending
+
+def validate_stock_availability(doc):
+    """Throw with every raw material shortfall of `doc` at once, before any Stock Entry is built"""
+    if is_negative_stock_allowed():
+        return
+
+    shortfalls = get_stock_shortfalls(
+        [(doc.name, doc.source_warehouse, d.item_code, d.qty, d.uom) for d in doc.raw_materials],
+        item_map=doc.get_item_details_map()
+    )
+    if shortfalls:
+        frappe.throw(
+            "<br>".join(
+                _("{0}: {1} required in {2}, {3} available").format(
+                    frappe.bold(d.item_code), flt(d.required_qty, 3), d.warehouse, flt(d.available_qty, 3)
+                )
+                for d in shortfalls
+            ),
+            title=_("Insufficient Stock"),
+            exc=NegativeStockError
+        )
+
+@frappe.whitelist()
+def check_stock_availability(docs):
+    """Shortfalls for a batch of draft RMC Production Entries, as if all were submitted together"""
+    if isinstance(docs, str):
+        docs = json.loads(docs)
+
+    frappe.has_permission("RMC Production Entry", "read", throw=True)
+
+    names = list(dict.fromkeys(d.get("name") if isinstance(d, dict) else d for d in docs or []))
+    if not names or is_negative_stock_allowed():
+        return []
+
+    materials = frappe.db.sql("""
+        SELECT pe.name, pe.source_warehouse, rm.item_code, rm.qty, rm.uom
+        FROM `tabRMC Production Entry` pe
+        INNER JOIN `tabRMC Raw Materials` rm
+            ON rm.parent = pe.name AND rm.parenttype = 'RMC Production Entry'
+        WHERE pe.name IN %(names)s AND pe.docstatus = 0
+    """, {"names": names})
+
+    return get_stock_shortfalls(materials)
@@ -0,0 +1,258 @@
+"""Benchmarks for the RMC Production Entry submit and status pipelines.
+
+Seeds its own items, BOMs, plants and rates on a local test site and commits
+as it goes, so never run it on a production site:
+
+    bench --site test_site execute erpnext.stock.doctype.rmc_production_entry.benchmark.run \
+        --kwargs "{'sizes': [10, 100, 1000]}"
+
+Results are written as JSON so runs can be compared for regressions.
+"""
+import frappe
+import json
+import time
+from frappe import _
+from frappe.utils import add_days, flt, get_first_day, now, nowdate, nowtime
+from erpnext.stock.doctype.rmc_grade_rate.rmc_grade_rate import OPEN_RATE_END_DATE
+from erpnext.stock.doctype.rmc_production_entry.bulk_status import bulk_update_status
+from erpnext.stock.doctype.rmc_production_entry.instrumentation import count_queries
+from erpnext.stock.doctype.rmc_production_entry.utils import (
+    RMC_TRANSIT_WAREHOUSE,
+    get_posting_schedule,
+    get_voucher_mode,
+    percentile
+)
+
+DEFAULT_SIZES = (10, 100, 1000)
+BENCH_PREFIX = "RMC-BENCH"
+
+# Per cubic metre of each seeded grade: (raw material index, qty, rate)
+BENCH_MIX = ((0, 300, 8.0), (1, 800, 1.2), (2, 1100, 0.9))
+TICKET_QUANTITY = 6
+SEED_STOCK_QTY = 10000000
+
+def measure(fn, *args, **kwargs):
+    """Run `fn` once and return (result, seconds, queries)"""
+    with count_queries() as counter:
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        seconds = time.perf_counter() - start
+    return result, seconds, counter.queries
+
+def summarize(samples):
+    """Latency and query statistics of per-operation (seconds, queries) samples"""
+    latencies = [seconds * 1000 for seconds, _queries in samples]
+    queries = [count for _seconds, count in samples]
+    return {
+        "operations": len(samples),
+        "total_seconds": round(sum(latencies) / 1000, 4),
+        "mean_ms": round(sum(latencies) / len(latencies), 3) if latencies else 0,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "max_ms": round(max(latencies), 3) if latencies else 0,
+        "queries_per_operation": round(sum(queries) / len(queries), 2) if queries else 0,
+        "max_queries": max(queries) if queries else 0
+    }
+
+def run(sizes=None, grades=3, plants=2, output=None):
+    """Seed data, benchmark each batch size and write the results as JSON"""
+    if not frappe.conf.allow_tests:
+        frappe.throw(_("Benchmarks commit seeded data; run them on a test site with allow_tests enabled"))
+
+    if get_posting_schedule() != "Immediate":
+        frappe.throw(_("Set rmc_posting_schedule to Immediate to benchmark ledger posting"))
+
+    frappe.set_user("Administrator")
+    context = seed(int(grades), int(plants))
+
+    results = {
+        "site": frappe.local.site,
+        "started_at": now(),
+        "frappe_version": frappe.__version__,
+        "voucher_mode": get_voucher_mode(),
+        "posting_schedule": get_posting_schedule(),
+        "grades": int(grades),
+        "plants": int(plants),
+        "sizes": {}
+    }
+
+    for size in sizes or DEFAULT_SIZES:
+        results["sizes"][str(size)] = benchmark_size(context, int(size))
+
+    results["finished_at"] = now()
+
+    output = output or frappe.get_site_path("private", "files", f"rmc_benchmark_{frappe.generate_hash(length=8)}.json")
+    with open(output, "w") as f:
+        json.dump(results, f, indent=4, default=str)
+
+    frappe.logger("rmc").info(f"RMC benchmark results written to {output}")
+    return output
+
+def benchmark_size(context, size):
+    """Create, submit and move `size` tickets through the status pipeline"""
+    docs = [make_ticket(context, i) for i in range(size)]
+
+    insert_samples = []
+    for doc in docs:
+        _result, seconds, queries = measure(doc.insert)
+        insert_samples.append((seconds, queries))
+    frappe.db.commit()
+
+    submit_samples = []
+    for doc in docs:
+        _result, seconds, queries = measure(doc.submit)
+        submit_samples.append((seconds, queries))
+        frappe.db.commit()
+
+    # update_status commits its own transaction
+    transition_samples = []
+    for doc in docs:
+        _result, seconds, queries = measure(doc.update_status, "In-Transit")
+        transition_samples.append((seconds, queries))
+
+    result, seconds, queries = measure(bulk_update_status, [doc.name for doc in docs], "Delivered")
+    frappe.db.commit()
+
+    return {
+        "validate_insert": summarize(insert_samples),
+        "submit": summarize(submit_samples),
+        "update_status": summarize(transition_samples),
+        "bulk_update_status": {
+            "documents": size,
+            "moved": len(result.success),
+            "failed": len(result.failed),
+            "seconds": round(seconds, 4),
+            "queries": queries,
+            "documents_per_second": round(size / seconds, 2) if seconds else 0
+        }
+    }
+
+def make_ticket(context, i):
+    """Draft ticket spread round robin across the seeded grades and plants"""
+    grade = context.grades[i % len(context.grades)]
+    doc = frappe.new_doc("RMC Production Entry")
+    doc.update({
+        "company": context.company,
+        "production_date": nowdate(),
+        "posting_time": nowtime(),
+        "ticket_number": f"{BENCH_PREFIX}-{frappe.generate_hash(length=10)}",
+        "rmc_grade": grade.item_code,
+        "bom": grade.bom,
+        "quantity": TICKET_QUANTITY,
+        "lorry_number": f"BENCH-{i % 20}",
+        "source_warehouse": context.plants[i % len(context.plants)],
+        "destination_warehouse": context.site_warehouse
+    })
+    doc.get_bom_materials()
+    return doc
+
+def seed(grades, plants):
+    """Create the company-level fixtures the benchmark needs, reusing earlier runs"""
+    company = frappe.defaults.get_global_default("company") or frappe.get_all("Company", pluck="name", limit=1)[0]
+    abbr = frappe.get_cached_value("Company", company, "abbr")
+    item_group = frappe.db.get_value("Item Group", {"is_group": 0}, "name")
+
+    context = frappe._dict(company=company, grades=[], plants=[])
+    context.plants = [make_warehouse(f"{BENCH_PREFIX} Plant {i + 1}", company, abbr) for i in range(plants)]
+    context.site_warehouse = make_warehouse(f"{BENCH_PREFIX} Site", company, abbr)
+    if not frappe.db.exists("Warehouse", RMC_TRANSIT_WAREHOUSE):
+        frappe.get_doc({
+            "doctype": "Warehouse",
+            "warehouse_name": RMC_TRANSIT_WAREHOUSE.rsplit(" - ", 1)[0],
+            "company": company
+        }).insert(set_name=RMC_TRANSIT_WAREHOUSE)
+
+    raw_materials = [make_item(f"{BENCH_PREFIX}-RM-{i + 1}", item_group) for i in range(len(BENCH_MIX))]
+    seed_stock(company, context.plants, raw_materials)
+
+    for i in range(grades):
+        item_code = make_item(f"{BENCH_PREFIX}-GRADE-{i + 1}", item_group)
+        context.grades.append(frappe._dict(
+            item_code=item_code,
+            bom=make_bom(item_code, company, raw_materials)
+        ))
+        for plant in context.plants:
+            make_rate(item_code, plant, 250 + 50 * i)
+
+    frappe.db.commit()
+    return context
+
+def make_warehouse(warehouse_name, company, abbr):
+    name = f"{warehouse_name} - {abbr}"
+    if not frappe.db.exists("Warehouse", name):
+        frappe.get_doc({"doctype": "Warehouse", "warehouse_name": warehouse_name, "company": company}).insert()
+    return name
+
+def make_item(item_code, item_group):
+    if not frappe.db.exists("Item", item_code):
+        frappe.get_doc({
+            "doctype": "Item",
+            "item_code": item_code,
+            "item_name": item_code,
+            "item_group": item_group,
+            "stock_uom": "Nos",
+            "is_stock_item": 1
+        }).insert()
+    return item_code
+
+def make_bom(item_code, company, raw_materials):
+    bom = frappe.db.get_value("BOM", {"item": item_code, "is_default": 1, "docstatus": 1})
+    if bom:
+        return bom
+
+    bom = frappe.get_doc({
+        "doctype": "BOM",
+        "item": item_code,
+        "company": company,
+        "quantity": 1,
+        "rm_cost_as_per": "Manual",
+        "items": [
+            {"item_code": raw_materials[index], "qty": qty, "rate": rate}
+            for index, qty, rate in BENCH_MIX
+        ]
+    })
+    bom.insert()
+    bom.submit()
+    return bom.name
+
+def make_rate(item_code, warehouse, rate):
+    if not frappe.db.exists("RMC Grade Rate", {"rmc_grade": item_code, "warehouse": warehouse, "disabled": 0}):
+        frappe.get_doc({
+            "doctype": "RMC Grade Rate",
+            "rmc_grade": item_code,
+            "warehouse": warehouse,
+            "from_date": get_first_day(add_days(nowdate(), -365)),
+            "to_date": OPEN_RATE_END_DATE,
+            "rate": rate
+        }).insert()
+
+def seed_stock(company, plants, raw_materials):
+    """Top every plant back up to SEED_STOCK_QTY of each raw material, so earlier runs never starve a later one"""
+    bins = frappe.get_all(
+        "Bin",
+        filters={"item_code": ("in", raw_materials), "warehouse": ("in", plants)},
+        fields=["item_code", "warehouse", "actual_qty"]
+    )
+    stock = {(d.item_code, d.warehouse): flt(d.actual_qty) for d in bins}
+
+    missing = [
+        (item_code, plant, rate, SEED_STOCK_QTY - stock.get((item_code, plant), 0))
+        for plant in plants
+        for (_index, _qty, rate), item_code in zip(BENCH_MIX, raw_materials, strict=True)
+        if stock.get((item_code, plant), 0) < SEED_STOCK_QTY
+    ]
+    if not missing:
+        return
+
+    receipt = frappe.get_doc({
+        "doctype": "Stock Entry",
+        "stock_entry_type": "Material Receipt",
+        "purpose": "Material Receipt",
+        "company": company,
+        "items": [
+            {"item_code": item_code, "qty": qty, "t_warehouse": plant, "basic_rate": flt(rate)}
+            for item_code, plant, rate, qty in missing
+        ]
+    })
+    receipt.insert()
+    receipt.submit()
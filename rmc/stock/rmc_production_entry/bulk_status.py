@@ -0,0 +1,268 @@
+import frappe
+import json
+from frappe import _
+from frappe.utils import flt, now
+from erpnext.stock.doctype.rmc_production_entry.dispatch_dashboard import record_transition
+from erpnext.stock.doctype.rmc_production_entry.instrumentation import instrumented
+from erpnext.stock.doctype.rmc_status_transition.rmc_status_transition import log_transitions
+from erpnext.stock.doctype.rmc_production_entry.status_events import publish_status_change
+from erpnext.stock.doctype.rmc_production_entry.utils import (
+    PREVIOUS_STATUS,
+    SHIFT_PENDING_STATUS,
+    VALID_STATUS_TRANSITIONS,
+    get_company_rmc_context,
+    get_item_details_map,
+    get_transfer_warehouses
+)
+
+# Upper bound on rows in one consolidated Material Transfer
+MAX_ROWS_PER_TRANSFER = 100
+
+# Background status updates: entries per worker job, and how long results are kept
+STATUS_JOB_CHUNK_SIZE = 50
+STATUS_JOB_TTL = 24 * 60 * 60
+STATUS_JOB_PROGRESS_EVENT = "rmc_status_update_progress"
+
+ENTRY_FIELDS = [
+    "name", "docstatus", "workflow_state", "company", "rmc_grade", "quantity",
+    "per_unit_cost", "source_warehouse", "destination_warehouse", "posting_status",
+    "production_date", "posting_time", "lorry_number"
+]
+
+@instrumented("bulk_update_status")
+def bulk_update_status(names, status):
+    """Move many submitted RMC Production Entries to `status` in one pass.
+
+    Every transition is validated up front, entries are grouped into one
+    Material Transfer per (company, source, target warehouse),
+    and the state of all entries that moved is written with a single UPDATE.
+    Entries pending shift posting move without a transfer.
+    Returns the names that moved, the names that did not and why.
+    """
+    if status not in PREVIOUS_STATUS:
+        frappe.throw(_("Invalid status"))
+
+    result = frappe._dict(success=[], failed=[], errors={})
+    names = list(dict.fromkeys(name for name in names if name))
+    if not names:
+        return result
+
+    def fail(name, error):
+        result.failed.append(name)
+        result.errors[name] = error
+
+    # Lock the selected rows so concurrent status updates cannot slip past validation
+    entries = frappe.get_all(
+        "RMC Production Entry",
+        filters={"name": ("in", names)},
+        fields=ENTRY_FIELDS,
+        for_update=True
+    )
+    entry_map = {d.name: d for d in entries}
+
+    groups = {}
+    moved = []
+    for name in names:
+        entry = entry_map.get(name)
+        error = validate_transition(entry, status)
+        if error:
+            fail(name, error)
+            continue
+
+        if entry.posting_status == SHIFT_PENDING_STATUS:
+            # Transferred at shift close from the transition log
+            moved.append(entry)
+            continue
+
+        source, target = get_transfer_warehouses(entry, status)
+        key = (entry.company, source, target)
+        groups.setdefault(key, []).append(entry)
+
+    item_map = get_item_details_map({d.rmc_grade for group in groups.values() for d in group})
+
+    stock_entries = {}
+    for key, group in groups.items():
+        for start in range(0, len(group), MAX_ROWS_PER_TRANSFER):
+            chunk = group[start:start + MAX_ROWS_PER_TRANSFER]
+            savepoint = f"rmc_status_{frappe.generate_hash(length=8)}"
+            frappe.db.savepoint(savepoint)
+            try:
+                transfer_entry = make_transfer_entry(chunk, *key, item_map=item_map)
+                moved.extend(chunk)
+                stock_entries.update((d.name, transfer_entry.name) for d in chunk)
+            except Exception as e:
+                frappe.db.rollback(save_point=savepoint)
+                frappe.log_error(f"Failed to create transfer for {', '.join(d.name for d in chunk)}: {e}")
+                for d in chunk:
+                    fail(d.name, str(e))
+
+    if moved:
+        status_changed_at = now()
+        frappe.db.sql("""
+            UPDATE `tabRMC Production Entry`
+            SET workflow_state = %s, status_changed_at = %s, modified = %s, modified_by = %s
+            WHERE name IN %s AND workflow_state = %s
+        """, (
+            status,
+            status_changed_at,
+            status_changed_at,
+            frappe.session.user,
+            [d.name for d in moved],
+            PREVIOUS_STATUS[status]
+        ))
+        result.success = [d.name for d in moved]
+        log_transitions(moved, PREVIOUS_STATUS[status], status, status_changed_at, stock_entries)
+        record_transition(moved, PREVIOUS_STATUS[status], status, status_changed_at)
+        publish_status_change(result.success, status, status_changed_at)
+
+    return result
+
+def validate_transition(entry, status):
+    """Return why `entry` cannot move to `status`, or None if it can"""
+    if not entry:
+        return _("RMC Production Entry not found")
+
+    if entry.docstatus != 1:
+        return _("Document must be submitted before updating status")
+
+    if status not in VALID_STATUS_TRANSITIONS.get(entry.workflow_state, []):
+        return _("Cannot change status from {0} to {1}").format(entry.workflow_state, status)
+
+    if entry.posting_status in ("Queued", "Failed"):
+        return _("Production of {0} has not been posted to the ledger yet").format(entry.name)
+
+def make_transfer_entry(entries, company, source_warehouse, target_warehouse, item_map):
+    """Create and submit one Material Transfer moving the RMC of all `entries`"""
+    cost_center = get_company_rmc_context(company).cost_center
+
+    # Without set_posting_time the transfer is posted at the current date and time,
+    # the same as the per-document transit and delivery entries.
+    transfer_entry = frappe.get_doc({
+        "doctype": "Stock Entry",
+        "stock_entry_type": "Material Transfer",
+        "purpose": "Material Transfer",
+        "company": company,
+        "rmc_production_entry": entries[0].name if len(entries) == 1 else None,
+        "remarks": _("RMC Production Entries: {0}").format(", ".join(d.name for d in entries))
+    })
+
+    for entry in entries:
+        details = item_map.get(entry.rmc_grade)
+        transfer_entry.append("items", {
+            "item_code": entry.rmc_grade,
+            "qty": entry.quantity,
+            "stock_uom": details.stock_uom if details else None,
+            "conversion_factor": 1.0,
+            "s_warehouse": source_warehouse,
+            "t_warehouse": target_warehouse,
+            "cost_center": cost_center,
+            "basic_rate": flt(entry.per_unit_cost)
+        })
+
+    transfer_entry.save()
+    transfer_entry.submit()
+    return transfer_entry
+
+@frappe.whitelist()
+def enqueue_update_status(docs, status, queue="long"):
+    """Split a status update into chunks and run them as background jobs.
+
+    Progress is published to the requesting user as realtime events and the
+    combined result can be read back with `get_status_update_job`.
+    """
+    if isinstance(docs, str):
+        docs = json.loads(docs)
+
+    frappe.has_permission("RMC Production Entry", "write", throw=True)
+
+    if status not in PREVIOUS_STATUS:
+        frappe.throw(_("Invalid status"))
+
+    if queue not in ("short", "default", "long"):
+        frappe.throw(_("Invalid queue {0}").format(queue))
+
+    names = list(dict.fromkeys(d.get("name") if isinstance(d, dict) else d for d in docs or []))
+    if not names:
+        return
+
+    status_job = frappe.generate_hash(length=12)
+    chunks = [names[i:i + STATUS_JOB_CHUNK_SIZE] for i in range(0, len(names), STATUS_JOB_CHUNK_SIZE)]
+    meta = {
+        "job_id": status_job,
+        "status": status,
+        "user": frappe.session.user,
+        "total": len(names),
+        "chunks": len(chunks),
+        "created_at": now()
+    }
+
+    cache_key = get_status_job_key(status_job)
+    frappe.cache().hset(cache_key, "meta", meta)
+    frappe.cache().expire(frappe.cache().make_key(cache_key), STATUS_JOB_TTL)
+
+    for chunk_index, chunk in enumerate(chunks):
+        frappe.enqueue(
+            run_status_update_chunk,
+            queue=queue,
+            job_id=f"rmc_status_{status_job}_{chunk_index}",
+            enqueue_after_commit=True,
+            status_job=status_job,
+            chunk_index=chunk_index,
+            names=chunk,
+            status=status
+        )
+
+    return meta
+
+def run_status_update_chunk(status_job, chunk_index, names, status):
+    """Background job: apply one chunk of a status update and publish progress"""
+    try:
+        result = bulk_update_status(names, status)
+        frappe.db.commit()
+    except Exception as e:
+        frappe.db.rollback()
+        frappe.log_error(f"RMC status update job {status_job} chunk {chunk_index} failed: {e}")
+        result = frappe._dict(success=[], failed=list(names), errors={name: str(e) for name in names})
+
+    frappe.cache().hset(get_status_job_key(status_job), f"chunk:{chunk_index}", dict(result))
+
+    job = get_status_update_job(status_job)
+    if job:
+        frappe.publish_realtime(
+            STATUS_JOB_PROGRESS_EVENT,
+            {
+                "job_id": status_job,
+                "status": status,
+                "total": job["total"],
+                "processed": job["processed"],
+                "success": len(job["success"]),
+                "failed": job["failed"],
+                "done": job["done"]
+            },
+            user=job["user"]
+        )
+
+@frappe.whitelist()
+def get_status_update_job(job_id):
+    """Combined progress and results of a background status update"""
+    stored = frappe.cache().hgetall(get_status_job_key(job_id))
+    stored = {frappe.safe_decode(key): value for key, value in stored.items()}
+    meta = stored.pop("meta", None)
+    if not meta:
+        return None
+
+    if meta["user"] != frappe.session.user and frappe.session.user != "Administrator":
+        frappe.throw(_("Not permitted"), frappe.PermissionError)
+
+    job = dict(meta, success=[], failed=[], errors={})
+    for result in stored.values():
+        job["success"].extend(result["success"])
+        job["failed"].extend(result["failed"])
+        job["errors"].update(result["errors"])
+
+    job["processed"] = len(job["success"]) + len(job["failed"])
+    job["done"] = len(stored) >= meta["chunks"]
+    return job
+
+def get_status_job_key(job_id):
+    return f"rmc_status_update_job|{job_id}"
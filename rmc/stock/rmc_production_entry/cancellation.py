@@ -0,0 +1,97 @@
+import frappe
+import json
+from frappe import _
+
+def get_linked_vouchers(names):
+    """Submitted vouchers created for `names`, with every ticket each one carries.
+
+    Single-ticket vouchers carry the ticket in `rmc_production_entry`; consolidated
+    transfers are found through the Stock Entry recorded in the transition log,
+    and shift postings through RMC Shift Posting Voucher, together with the
+    other tickets they carry.
+    """
+    rows = frappe.db.sql("""
+        SELECT 'Stock Entry' AS voucher_type, name, rmc_production_entry AS ticket,
+            TIMESTAMP(posting_date, posting_time) AS posted_at, creation
+        FROM `tabStock Entry`
+        WHERE docstatus = 1 AND rmc_production_entry IN %(names)s
+        UNION
+        SELECT 'Stock Entry', se.name, log.rmc_production_entry,
+            TIMESTAMP(se.posting_date, se.posting_time), se.creation
+        FROM `tabRMC Status Transition` log
+        INNER JOIN `tabStock Entry` se ON se.name = log.stock_entry
+        WHERE se.docstatus = 1 AND log.stock_entry IN (
+            SELECT stock_entry FROM `tabRMC Status Transition`
+            WHERE rmc_production_entry IN %(names)s AND stock_entry IS NOT NULL
+        )
+        UNION
+        SELECT 'Stock Entry', se.name, sv.rmc_production_entry,
+            TIMESTAMP(se.posting_date, se.posting_time), se.creation
+        FROM `tabRMC Shift Posting Voucher` sv
+        INNER JOIN `tabStock Entry` se ON se.name = sv.voucher_no
+        WHERE sv.voucher_type = 'Stock Entry' AND se.docstatus = 1 AND sv.voucher_no IN (
+            SELECT voucher_no FROM `tabRMC Shift Posting Voucher` WHERE rmc_production_entry IN %(names)s
+        )
+        UNION
+        SELECT 'Journal Entry', je.name, sv.rmc_production_entry, je.creation, je.creation
+        FROM `tabRMC Shift Posting Voucher` sv
+        INNER JOIN `tabJournal Entry` je ON je.name = sv.voucher_no
+        WHERE sv.voucher_type = 'Journal Entry' AND je.docstatus = 1 AND sv.voucher_no IN (
+            SELECT voucher_no FROM `tabRMC Shift Posting Voucher` WHERE rmc_production_entry IN %(names)s
+        )
+    """, {"names": names}, as_dict=1)
+
+    vouchers = {}
+    for row in rows:
+        voucher = vouchers.setdefault((row.voucher_type, row.name), frappe._dict(row, tickets=set()))
+        voucher.tickets.add(row.ticket)
+
+    return vouchers
+
+def cancel_linked_vouchers(names):
+    """Cancel every voucher linked to `names`, latest posting first.
+
+    A consolidated voucher can only be cancelled when all tickets it carries
+    are being cancelled with it.
+    """
+    vouchers = get_linked_vouchers(names)
+
+    for voucher in vouchers.values():
+        others = voucher.tickets - set(names)
+        if others:
+            frappe.throw(_("{0} {1} also carries {2}. Cancel these entries together.").format(
+                _(voucher.voucher_type), voucher.name, ", ".join(sorted(others))
+            ))
+
+    for voucher in sorted(
+        vouchers.values(),
+        key=lambda d: (d.posted_at, d.creation),
+        reverse=True
+    ):
+        frappe.get_doc(voucher.voucher_type, voucher.name).cancel()
+
+@frappe.whitelist()
+def cancel_entries(docs):
+    """Cancel a batch of RMC Production Entries and their vouchers in one transaction"""
+    if isinstance(docs, str):
+        docs = json.loads(docs)
+
+    frappe.has_permission("RMC Production Entry", "cancel", throw=True)
+
+    names = list(dict.fromkeys(d.get("name") if isinstance(d, dict) else d for d in docs or []))
+    if not names:
+        return []
+
+    entries = [frappe.get_doc("RMC Production Entry", name, for_update=True) for name in names]
+    for doc in entries:
+        if doc.docstatus != 1:
+            frappe.throw(_("{0} is not submitted").format(doc.name))
+
+    # Vouchers shared between tickets of the batch are cancelled once, up front
+    cancel_linked_vouchers(names)
+
+    for doc in entries:
+        doc.flags.linked_vouchers_cancelled = True
+        doc.cancel()
+
+    return names
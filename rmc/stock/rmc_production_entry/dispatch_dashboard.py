@@ -0,0 +1,182 @@
+import frappe
+from frappe import _
+from frappe.utils import flt, get_datetime, time_diff_in_hours
+
+# Redis hash of running totals. Fields are "<measure>|<state>|<company>|<plant>|<grade>"
+# for "count" and "qty", and "<measure>|<company>|<plant>|<grade>" for the
+# Produced -> Delivered "cycle_hours" sum and "cycle_count". Cycle times run
+# between the Produced and Delivered rows of the transition log, as in
+# get_cycle_time_percentiles.
+DISPATCH_COUNTERS_KEY = "rmc_dispatch_counters"
+
+def record_submission(entries):
+    """Count newly produced entries"""
+    increments = {}
+    for entry in entries:
+        add_state(increments, entry, "Produced", 1)
+    apply_after_commit(increments)
+
+def record_transition(entries, from_state, to_state, status_changed_at):
+    """Move entries between state counters; deliveries also add their cycle time"""
+    increments = {}
+    produced_at = get_produced_at([d.name for d in entries]) if to_state == "Delivered" else {}
+    for entry in entries:
+        add_state(increments, entry, from_state, -1)
+        add_state(increments, entry, to_state, 1)
+        if to_state == "Delivered":
+            add_cycle_time(increments, entry, produced_at.get(entry.name), status_changed_at)
+    apply_after_commit(increments)
+
+def record_cancellation(entries):
+    """Remove cancelled entries from the counters of the state they were in"""
+    increments = {}
+    produced_at = get_produced_at([d.name for d in entries if d.workflow_state == "Delivered"])
+    for entry in entries:
+        add_state(increments, entry, entry.workflow_state, -1)
+        if entry.workflow_state == "Delivered":
+            add_cycle_time(increments, entry, produced_at.get(entry.name), entry.status_changed_at, sign=-1)
+    apply_after_commit(increments)
+
+def add_state(increments, entry, state, sign):
+    key = f"{state}|{entry.company}|{entry.source_warehouse}|{entry.rmc_grade}"
+    increments[f"count|{key}"] = increments.get(f"count|{key}", 0) + sign
+    increments[f"qty|{key}"] = increments.get(f"qty|{key}", 0) + sign * flt(entry.quantity)
+
+def add_cycle_time(increments, entry, produced_at, delivered_at, sign=1):
+    if not produced_at or not delivered_at:
+        return
+
+    key = f"{entry.company}|{entry.source_warehouse}|{entry.rmc_grade}"
+    hours = time_diff_in_hours(get_datetime(delivered_at), get_datetime(produced_at))
+    increments[f"cycle_hours|{key}"] = increments.get(f"cycle_hours|{key}", 0) + sign * hours
+    increments[f"cycle_count|{key}"] = increments.get(f"cycle_count|{key}", 0) + sign
+
+def get_produced_at(names):
+    """When each entry reached Produced, from the transition log, in one query"""
+    if not names:
+        return {}
+
+    return dict(frappe.db.sql("""
+        SELECT rmc_production_entry, MIN(transitioned_at)
+        FROM `tabRMC Status Transition`
+        WHERE rmc_production_entry IN %s AND to_state = 'Produced'
+        GROUP BY rmc_production_entry
+    """, (names,)))
+
+def apply_after_commit(increments):
+    # Counters only move once the state change they describe is durable
+    if increments:
+        frappe.db.after_commit.add(lambda: apply_increments(increments))
+
+def apply_increments(increments):
+    pipeline = frappe.cache().pipeline()
+    key = frappe.cache().make_key(DISPATCH_COUNTERS_KEY)
+    for field, amount in increments.items():
+        if amount:
+            pipeline.hincrbyfloat(key, field, amount)
+    pipeline.execute()
+
+def get_counters():
+    # Counter values are plain numbers, not pickled like other frappe cache values,
+    # so they are read with a raw HGETALL instead of the unpickling RedisWrapper.hgetall
+    values = frappe.cache().execute_command("HGETALL", frappe.cache().make_key(DISPATCH_COUNTERS_KEY))
+    return {frappe.safe_decode(field): flt(frappe.safe_decode(value)) for field, value in values.items()}
+
+@frappe.whitelist()
+def get_dispatch_dashboard(company=None, plant=None):
+    """Live counts and volumes per state, grade and plant, with average cycle times.
+
+    Served from the running counters, so the cost depends on the number of
+    grade/plant combinations, not on the number of tickets.
+    """
+    frappe.has_permission("RMC Production Entry", "read", throw=True)
+
+    states, grades, plants, cycles = {}, {}, {}, {}
+    for field, value in get_counters().items():
+        parts = field.split("|")
+        measure = parts[0]
+
+        if measure in ("count", "qty"):
+            state, row_company, row_plant, grade = parts[1:]
+            if (company and row_company != company) or (plant and row_plant != plant):
+                continue
+            for group, key in ((states, state), (grades, (state, grade)), (plants, (state, row_plant))):
+                totals = group.setdefault(key, {"count": 0, "qty": 0})
+                totals[measure] += value
+
+        elif measure in ("cycle_hours", "cycle_count"):
+            row_company, row_plant, grade = parts[1:]
+            if (company and row_company != company) or (plant and row_plant != plant):
+                continue
+            totals = cycles.setdefault((row_plant, grade), {"cycle_hours": 0, "cycle_count": 0})
+            totals[measure] += value
+
+    def rows(group, *labels):
+        return [
+            dict(zip(labels, key if isinstance(key, tuple) else (key,), strict=True), count=round(d["count"]), qty=d["qty"])
+            for key, d in sorted(group.items())
+            if round(d["count"])
+        ]
+
+    return {
+        "by_state": rows(states, "workflow_state"),
+        "by_grade": rows(grades, "workflow_state", "rmc_grade"),
+        "by_plant": rows(plants, "workflow_state", "plant"),
+        "cycle_times": [
+            {
+                "plant": key[0],
+                "rmc_grade": key[1],
+                "deliveries": round(d["cycle_count"]),
+                "avg_cycle_hours": d["cycle_hours"] / d["cycle_count"]
+            }
+            for key, d in sorted(cycles.items())
+            if round(d["cycle_count"])
+        ]
+    }
+
+@frappe.whitelist()
+def reconcile_dispatch_counters():
+    """Rebuild all counters from submitted entries and swap them in atomically"""
+    if frappe.session.user != "Administrator" and "Stock Manager" not in frappe.get_roles():
+        frappe.throw(_("Not permitted"), frappe.PermissionError)
+
+    counters = {}
+    for row in frappe.db.sql("""
+        SELECT workflow_state, company, source_warehouse, rmc_grade,
+            COUNT(*) AS count, SUM(quantity) AS qty
+        FROM `tabRMC Production Entry`
+        WHERE docstatus = 1
+        GROUP BY workflow_state, company, source_warehouse, rmc_grade
+    """, as_dict=1):
+        key = f"{row.workflow_state}|{row.company}|{row.source_warehouse}|{row.rmc_grade}"
+        counters[f"count|{key}"] = row.count
+        counters[f"qty|{key}"] = flt(row.qty)
+
+    for row in frappe.db.sql("""
+        SELECT entry.company, entry.source_warehouse, entry.rmc_grade, COUNT(*) AS cycle_count,
+            SUM(TIMESTAMPDIFF(SECOND, produced.transitioned_at, entry.status_changed_at)) / 3600
+                AS cycle_hours
+        FROM `tabRMC Production Entry` entry
+        INNER JOIN (
+            SELECT rmc_production_entry, MIN(transitioned_at) AS transitioned_at
+            FROM `tabRMC Status Transition`
+            WHERE to_state = 'Produced'
+            GROUP BY rmc_production_entry
+        ) produced ON produced.rmc_production_entry = entry.name
+        WHERE entry.docstatus = 1 AND entry.workflow_state = 'Delivered' AND entry.status_changed_at IS NOT NULL
+        GROUP BY entry.company, entry.source_warehouse, entry.rmc_grade
+    """, as_dict=1):
+        key = f"{row.company}|{row.source_warehouse}|{row.rmc_grade}"
+        counters[f"cycle_hours|{key}"] = flt(row.cycle_hours)
+        counters[f"cycle_count|{key}"] = row.cycle_count
+
+    key = frappe.cache().make_key(DISPATCH_COUNTERS_KEY)
+    staging_key = frappe.cache().make_key(f"{DISPATCH_COUNTERS_KEY}|rebuild")
+    pipeline = frappe.cache().pipeline()
+    pipeline.delete(staging_key)
+    if counters:
+        pipeline.hset(staging_key, mapping=counters)
+        pipeline.rename(staging_key, key)
+    else:
+        pipeline.delete(key)
+    pipeline.execute()
@@ -0,0 +1,273 @@
+"""Low-overhead timing of the RMC Production Entry hot paths.
+
+Enabled with `"rmc_instrumentation": 1` in site config. While enabled, every
+instrumented stage records wall time, queries and rows touched. Samples are
+collected per request or job, pushed into a capped redis list when it ends,
+and rolled up hourly into RMC Stage Timing. While disabled, an instrumented
+call costs one config lookup.
+"""
+import frappe
+import functools
+import json
+import math
+import time
+from contextlib import contextmanager
+from frappe.model.document import Document
+from frappe.utils import cint, flt, now, now_datetime
+from erpnext.stock.doctype.rmc_production_entry.utils import percentile
+
+SAMPLES_KEY = "rmc_instrumentation_samples"
+
+# Samples kept between rollups; older ones are dropped from the ring buffer
+RING_BUFFER_SIZE = 20000
+
+# Rollups keep a log-scale latency histogram so percentiles can be computed
+# over any range of hours. Each bucket is 5% wider than the one before it,
+# which bounds the error of a merged percentile to 5%.
+HISTOGRAM_MIN_MS = 0.01
+HISTOGRAM_GROWTH = 1.05
+
+def is_enabled():
+    return bool(frappe.conf.rmc_instrumentation)
+
+@contextmanager
+def instrument(stage, plant=None):
+    """Record the enclosed block as one sample of `stage`"""
+    if not is_enabled():
+        yield
+        return
+
+    samples = get_request_samples()
+    with count_queries() as counter:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            samples.append({
+                "stage": stage,
+                "plant": plant,
+                "ms": round((time.perf_counter() - start) * 1000, 3),
+                "queries": counter.queries,
+                "rows": counter.rows
+            })
+
+def instrumented(stage):
+    """Decorator form of `instrument`; methods of a document are tagged with its plant"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not is_enabled():
+                return fn(*args, **kwargs)
+
+            doc = args[0] if args and isinstance(args[0], Document) else None
+            with instrument(stage, doc.get("source_warehouse") if doc else None):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+@contextmanager
+def count_queries():
+    """Count `frappe.db.sql` calls and the rows they touch within the block.
+
+    Calls made through the query builder are counted too. Blocks may nest;
+    each one restores the `sql` it replaced on the way out, errors included.
+    """
+    db = frappe.db
+    replaced = db.__dict__.get("sql")
+    sql = db.sql
+    counter = frappe._dict(queries=0, rows=0)
+
+    def counted_sql(*args, **kwargs):
+        counter.queries += 1
+        result = sql(*args, **kwargs)
+        cursor = getattr(db, "_cursor", None)
+        counter.rows += max(getattr(cursor, "rowcount", 0) or 0, 0)
+        return result
+
+    db.sql = counted_sql
+    try:
+        yield counter
+    finally:
+        if replaced is None:
+            del db.sql
+        else:
+            db.sql = replaced
+
+def get_request_samples():
+    """Samples recorded so far in the current request or job"""
+    samples = getattr(frappe.local, "rmc_instrumentation", None)
+    if samples is None:
+        samples = frappe.local.rmc_instrumentation = []
+    return samples
+
+def flush_samples():
+    """after_request and after_job hook: push the samples of this request into the ring buffer"""
+    samples = getattr(frappe.local, "rmc_instrumentation", None)
+    frappe.local.rmc_instrumentation = None
+    if not samples:
+        return
+
+    hour = now_datetime().strftime("%Y-%m-%d %H:00:00")
+    key = frappe.cache().make_key(SAMPLES_KEY)
+    pipeline = frappe.cache().pipeline()
+    pipeline.lpush(key, *[json.dumps(dict(sample, hour=hour)) for sample in samples])
+    pipeline.ltrim(key, 0, RING_BUFFER_SIZE - 1)
+    pipeline.execute()
+
+def read_samples(drain=False):
+    """Samples in the ring buffer, optionally emptying it in the same transaction"""
+    key = frappe.cache().make_key(SAMPLES_KEY)
+    pipeline = frappe.cache().pipeline()
+    pipeline.lrange(key, 0, -1)
+    if drain:
+        pipeline.delete(key)
+    return [json.loads(value) for value in pipeline.execute()[0]]
+
+def summarize_samples(samples):
+    latencies = [flt(d["ms"]) for d in samples]
+    return {
+        "samples": len(samples),
+        "avg_ms": sum(latencies) / len(latencies),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": max(latencies),
+        "avg_queries": sum(d["queries"] for d in samples) / len(samples),
+        "avg_rows": sum(d["rows"] for d in samples) / len(samples)
+    }
+
+def get_histogram_bucket(ms):
+    return max(0, math.ceil(math.log(max(flt(ms), HISTOGRAM_MIN_MS) / HISTOGRAM_MIN_MS, HISTOGRAM_GROWTH)))
+
+def make_histogram(latencies):
+    """Sample count per log-scale bucket, keyed by bucket index"""
+    histogram = {}
+    for ms in latencies:
+        bucket = get_histogram_bucket(ms)
+        histogram[bucket] = histogram.get(bucket, 0) + 1
+    return histogram
+
+def merge_histograms(histograms):
+    merged = {}
+    for histogram in histograms:
+        for bucket, count in histogram.items():
+            merged[cint(bucket)] = merged.get(cint(bucket), 0) + cint(count)
+    return merged
+
+def histogram_percentile(histogram, q, max_ms=None):
+    """Nearest-rank percentile of a histogram: the upper bound of the bucket holding that rank"""
+    total = sum(histogram.values())
+    if not total:
+        return 0
+
+    rank = max(1, math.ceil(q / 100 * total))
+    seen = 0
+    for bucket in sorted(histogram):
+        seen += histogram[bucket]
+        if seen >= rank:
+            upper = HISTOGRAM_MIN_MS * HISTOGRAM_GROWTH ** bucket
+            return min(upper, max_ms) if max_ms is not None else upper
+
+def group_samples(samples, *keys):
+    groups = {}
+    for sample in samples:
+        groups.setdefault(tuple(sample.get(key) for key in keys), []).append(sample)
+    return groups
+
+def rollup_samples():
+    """Hourly job: move buffered samples into RMC Stage Timing, one row per hour, stage and plant.
+
+    Only finished hours are rolled up; samples of the current hour go back
+    into the buffer for the next run, so an hour is never split across rows.
+    """
+    samples = read_samples(drain=True)
+    current_hour = now_datetime().strftime("%Y-%m-%d %H:00:00")
+    pending = [d for d in samples if d["hour"] >= current_hour]
+    if pending:
+        # Back at the old end of the list, behind samples pushed since the drain
+        pipeline = frappe.cache().pipeline()
+        pipeline.rpush(frappe.cache().make_key(SAMPLES_KEY), *[json.dumps(d) for d in pending])
+        pipeline.execute()
+
+    samples = [d for d in samples if d["hour"] < current_hour]
+    if not samples:
+        return
+
+    timestamp = now()
+    fields = [
+        "name", "creation", "modified", "owner", "modified_by", "docstatus", "idx",
+        "period_start", "stage", "plant", "samples", "avg_ms", "p50_ms", "p95_ms",
+        "p99_ms", "max_ms", "avg_queries", "avg_rows", "histogram"
+    ]
+    rows = []
+    for (hour, stage, plant), group in group_samples(samples, "hour", "stage", "plant").items():
+        summary = summarize_samples(group)
+        rows.append((
+            frappe.generate_hash(length=10), timestamp, timestamp, "Administrator", "Administrator", 0, 0,
+            hour, stage, plant, summary["samples"], summary["avg_ms"], summary["p50_ms"],
+            summary["p95_ms"], summary["p99_ms"], summary["max_ms"], summary["avg_queries"],
+            summary["avg_rows"], json.dumps(make_histogram(flt(d["ms"]) for d in group))
+        ))
+
+    frappe.db.bulk_insert("RMC Stage Timing", fields, rows)
+
+@frappe.whitelist()
+def get_stage_timings(from_datetime=None, to_datetime=None, plant=None):
+    """Latency percentiles per stage and plant.
+
+    Without a range, exact percentiles of the samples not yet rolled up. With
+    a range, percentiles of the merged hourly histograms, within 5% of the
+    exact value.
+    """
+    frappe.only_for(("System Manager", "Stock Manager"))
+
+    if not from_datetime and not to_datetime:
+        samples = [d for d in read_samples() if not plant or d.get("plant") == plant]
+        return [
+            dict(stage=stage, plant=sample_plant, **summarize_samples(group))
+            for (stage, sample_plant), group in sorted(
+                group_samples(samples, "stage", "plant").items(),
+                key=lambda d: (d[0][0], d[0][1] or "")
+            )
+        ]
+
+    conditions = ""
+    values = {"from_datetime": from_datetime, "to_datetime": to_datetime, "plant": plant}
+    if from_datetime:
+        conditions += " AND period_start >= %(from_datetime)s"
+    if to_datetime:
+        conditions += " AND period_start < %(to_datetime)s"
+    if plant:
+        conditions += " AND plant = %(plant)s"
+
+    rollups = frappe.db.sql(f"""
+        SELECT stage, plant, samples, avg_ms, max_ms, avg_queries, avg_rows, histogram
+        FROM `tabRMC Stage Timing`
+        WHERE 1 = 1 {conditions}
+    """, values, as_dict=1)
+
+    timings = []
+    for (stage, rollup_plant), group in sorted(
+        group_samples(rollups, "stage", "plant").items(),
+        key=lambda d: (d[0][0], d[0][1] or "")
+    ):
+        samples = sum(cint(d.samples) for d in group)
+        if not samples:
+            continue
+
+        max_ms = max(flt(d.max_ms) for d in group)
+        histogram = merge_histograms(json.loads(d.histogram) for d in group if d.histogram)
+        timings.append({
+            "stage": stage,
+            "plant": rollup_plant,
+            "samples": samples,
+            "avg_ms": sum(flt(d.avg_ms) * cint(d.samples) for d in group) / samples,
+            "p50_ms": histogram_percentile(histogram, 50, max_ms),
+            "p95_ms": histogram_percentile(histogram, 95, max_ms),
+            "p99_ms": histogram_percentile(histogram, 99, max_ms),
+            "max_ms": max_ms,
+            "avg_queries": sum(flt(d.avg_queries) * cint(d.samples) for d in group) / samples,
+            "avg_rows": sum(flt(d.avg_rows) * cint(d.samples) for d in group) / samples
+        })
+
+    return timings
@@ -0,0 +1,85 @@
+import frappe
+import json
+from frappe.utils import cint
+
+# Failed postings are retried on later runs until they reach this many attempts
+MAX_POSTING_ATTEMPTS = 5
+POSTING_BATCH_SIZE = 100
+
+def enqueue_posting():
+    """Start the posting worker once the current transaction commits"""
+    frappe.enqueue(
+        process_posting_queue,
+        queue="short",
+        job_id=f"rmc_posting_queue::{frappe.local.site}",
+        deduplicate=True,
+        enqueue_after_commit=True
+    )
+
+def process_posting_queue():
+    """Post queued RMC Production Entries in posting date and time order.
+
+    Runs from the scheduler as well, which picks up retries and anything
+    enqueued while a previous run was still busy.
+    """
+    names = frappe.get_all(
+        "RMC Production Entry",
+        filters={"docstatus": 1, "posting_status": "Queued"},
+        order_by="production_date asc, posting_time asc, creation asc",
+        limit=POSTING_BATCH_SIZE,
+        pluck="name"
+    )
+
+    for name in names:
+        post_entry(name)
+
+    if len(names) == POSTING_BATCH_SIZE:
+        enqueue_posting()
+
+def post_entry(name):
+    """Create the ledger entries of one queued entry and record the outcome"""
+    doc = frappe.get_doc("RMC Production Entry", name, for_update=True)
+    if doc.docstatus != 1 or doc.posting_status != "Queued":
+        return
+
+    try:
+        doc.post_ledger_entries()
+        doc.db_set({"posting_status": "Posted", "posting_error": None}, update_modified=False)
+        frappe.db.commit()
+
+    except Exception:
+        frappe.db.rollback()
+        attempts = cint(doc.posting_attempts) + 1
+        frappe.db.set_value("RMC Production Entry", name, {
+            "posting_status": "Failed" if attempts >= MAX_POSTING_ATTEMPTS else "Queued",
+            "posting_attempts": attempts,
+            "posting_error": frappe.get_traceback()
+        }, update_modified=False)
+        frappe.db.commit()
+
+@frappe.whitelist()
+def requeue_failed_postings(docs):
+    """Put Failed entries back on the posting queue with a fresh attempt count"""
+    if isinstance(docs, str):
+        docs = json.loads(docs)
+
+    names = list(dict.fromkeys(d.get("name") if isinstance(d, dict) else d for d in docs or []))
+    for name in names:
+        frappe.has_permission("RMC Production Entry", "submit", doc=name, throw=True)
+
+    requeued = frappe.get_all(
+        "RMC Production Entry",
+        filters={"name": ("in", names), "docstatus": 1, "posting_status": "Failed"},
+        pluck="name"
+    ) if names else []
+    if not requeued:
+        return []
+
+    frappe.db.sql("""
+        UPDATE `tabRMC Production Entry`
+        SET posting_status = 'Queued', posting_attempts = 0, posting_error = NULL
+        WHERE name IN %s AND docstatus = 1 AND posting_status = 'Failed'
+    """, (requeued,))
+
+    enqueue_posting()
+    return requeued
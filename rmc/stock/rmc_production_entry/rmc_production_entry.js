@@ -2,6 +2,29 @@
 // For license information, please see license.txt
 
 frappe.ui.form.on('RMC Production Entry', {
+    onload: function(frm) {
+        // Status changes made elsewhere (list view, other dispatchers) are pushed here
+        frappe.realtime.doctype_subscribe(frm.doctype);
+        frappe.realtime.off('rmc_status_change', frm.rmc_status_change_handler);
+        frm.rmc_status_change_handler = (data) => {
+            if (frm.is_new() || !data.names.includes(frm.doc.name)
+                || data.workflow_state === frm.doc.workflow_state) {
+                return;
+            }
+
+            // Patch the state in place; unsaved edits on the form are kept
+            frm.doc.workflow_state = data.workflow_state;
+            frm.doc.status_changed_at = data.status_changed_at;
+            if (frm.is_dirty()) {
+                frm.refresh_fields(['workflow_state', 'status_changed_at']);
+                frm.trigger('update_status_info');
+            } else {
+                frm.refresh();
+            }
+        };
+        frappe.realtime.on('rmc_status_change', frm.rmc_status_change_handler);
+    },
+
     setup: function(frm) {
         frm.set_query("bom", function() {
             return {
@@ -31,7 +54,7 @@ frappe.ui.form.on('RMC Production Entry', {
 
         frm.trigger('update_status_info');
         
-        // Set up status info refresh timer
+        // Set up status info refresh timer; elapsed time is computed locally
         if (frm.doc.docstatus === 1 && frm.doc.workflow_state !== "Delivered") {
             if (!frm.status_update_timer) {
                 frm.status_update_timer = setInterval(() => {
@@ -61,16 +84,23 @@ frappe.ui.form.on('RMC Production Entry', {
                     frappe.confirm(
                         __('Are you sure you want to mark this as {0}?', [next_status]),
                         () => {
+                            // Reused until the move succeeds, so a retried click cannot move the entry twice
+                            if (!frm.rmc_transition || frm.rmc_transition.status !== next_status) {
+                                frm.rmc_transition = { status: next_status, key: frappe.utils.get_random(20) };
+                            }
+
                             frappe.call({
                                 method: 'erpnext.stock.doctype.rmc_production_entry.rmc_production_entry.update_single_status',
                                 args: {
                                     name: frm.doc.name,
-                                    status: next_status
+                                    status: next_status,
+                                    transition_key: frm.rmc_transition.key
                                 },
                                 freeze: true,
                                 freeze_message: __("Updating Status..."),
                                 callback: (r) => {
                                     if (!r.exc) {
+                                        frm.rmc_transition = null;
                                         frm.reload_doc();
                                         frappe.show_alert({
                                             message: __('Status updated to {0}', [next_status]),
@@ -83,37 +113,56 @@ frappe.ui.form.on('RMC Production Entry', {
                     );
                 });
             }
+
+            // Failed postings stop retrying; put them back on the queue once the cause is fixed
+            if (frm.doc.posting_status === "Failed") {
+                frm.add_custom_button(__('Retry Posting'), () => {
+                    frappe.call({
+                        method: 'erpnext.stock.doctype.rmc_production_entry.posting_queue.requeue_failed_postings',
+                        args: {
+                            docs: JSON.stringify([{ name: frm.doc.name }])
+                        },
+                        freeze: true,
+                        callback: (r) => {
+                            if (!r.exc) {
+                                frm.reload_doc();
+                                frappe.show_alert({
+                                    message: __('Queued for posting'),
+                                    indicator: 'blue'
+                                });
+                            }
+                        }
+                    });
+                });
+            }
         }
     },
 
     update_status_info: function(frm) {
         if (!frm.doc.status_changed_at || !frm.doc.workflow_state || frm.doc.docstatus !== 1) {
+            frm.dashboard.clear_headline();
             return;
         }
 
         const now = moment();
         const changed_at = moment(frm.doc.status_changed_at);
         const hours = moment.duration(now.diff(changed_at)).asHours();
-        
-        const alert_hours = {
-            "Produced": 2,
-            "In-Transit": 4
-        };
+        // Threshold for this company, plant and state, resolved by the server on load
+        const alert_hours = (frm.doc.__onload || {}).alert_hours;
 
-        let html = __("Time in current state: {0} hours", [Math.round(hours * 10) / 10]);
-        
-        if (frm.doc.workflow_state in alert_hours && hours > alert_hours[frm.doc.workflow_state]) {
-            html = `<div class="alert alert-warning">
-                        <div>
-                            <i class="fa fa-exclamation-triangle"></i>
-                            ${__("Alert: This entry has been in {0} state for {1} hours", 
-                                [frm.doc.workflow_state, Math.round(hours * 10) / 10])}
-                        </div>
-                    </div>`;
+        // Shown in the form dashboard so the document itself is never modified
+        if (alert_hours && hours > alert_hours) {
+            frm.dashboard.set_headline_alert(
+                `<i class="fa fa-exclamation-triangle"></i> ${__("Alert: This entry has been in {0} state for {1} hours",
+                    [frm.doc.workflow_state, Math.round(hours * 10) / 10])}`,
+                'orange'
+            );
+        } else {
+            frm.dashboard.set_headline_alert(
+                __("Time in current state: {0} hours", [Math.round(hours * 10) / 10]),
+                'blue'
+            );
         }
-
-        frm.set_value('time_in_current_state', html);
-        frm.refresh_field('time_in_current_state');
     },
 
     rmc_grade: function(frm) {
@@ -125,24 +174,37 @@ frappe.ui.form.on('RMC Production Entry', {
     },
 
     quantity: function(frm) {
+        // Only the scale factor changed: rescale locally from the cached BOM lines
+        load_costing_context(frm)
+            .then(() => apply_mixing_rate(frm))
+            .then(() => {
+                rescale_raw_materials(frm);
+                frm.trigger('calculate_costs');
+            });
+    },
+
+    production_date: function(frm) {
+        frm.trigger('get_mixing_rate');
+    },
+
+    source_warehouse: function(frm) {
         frm.trigger('get_mixing_rate');
-        if (frm.doc.bom) {
-            // Fetch BOM materials again when quantity changes
-            frm.trigger('bom');
-        }
     },
 
     get_mixing_rate: function(frm) {
         if (frm.doc.rmc_grade && frm.doc.production_date && frm.doc.source_warehouse) {
-            frm.call('get_mixing_rate')
+            load_costing_context(frm)
+                .then(() => apply_mixing_rate(frm))
                 .then(() => frm.trigger('calculate_costs'));
         }
     },
 
     bom: function(frm) {
         if (frm.doc.bom) {
-            frm.call('get_bom_materials')
-                .then(() => frm.trigger('calculate_costs'));
+            load_costing_context(frm).then(() => {
+                set_raw_materials_from_bom(frm);
+                frm.trigger('calculate_costs');
+            });
         }
     },
 
@@ -187,3 +249,92 @@ frappe.ui.form.on('RMC Raw Materials', {
         frm.trigger('calculate_costs');
     }
 });
+
+// Per-unit BOM lines and the rate schedule of the current grade, plant and BOM.
+// Fetched once per combination; quantity and date changes are worked out locally.
+function load_costing_context(frm) {
+    if (!frm.doc.rmc_grade || !frm.doc.source_warehouse) {
+        return Promise.resolve();
+    }
+
+    const key = [frm.doc.rmc_grade, frm.doc.source_warehouse, frm.doc.bom || ''].join('::');
+    if (frm.rmc_costing && frm.rmc_costing.key === key) {
+        return Promise.resolve(frm.rmc_costing);
+    }
+
+    return frappe.call({
+        method: 'erpnext.stock.doctype.rmc_production_entry.rmc_production_entry.get_costing_context',
+        args: {
+            rmc_grade: frm.doc.rmc_grade,
+            source_warehouse: frm.doc.source_warehouse,
+            bom: frm.doc.bom || null
+        }
+    }).then((r) => {
+        frm.rmc_costing = Object.assign({ key: key }, r.message);
+        return frm.rmc_costing;
+    });
+}
+
+function apply_mixing_rate(frm) {
+    if (!frm.rmc_costing || !frm.doc.production_date) {
+        return;
+    }
+
+    const date = frm.doc.production_date;
+    const interval = frm.rmc_costing.rate_schedule.find(d => d.from_date <= date && d.to_date >= date);
+    if (!interval) {
+        frappe.show_alert({
+            message: __("No mixing rate found for {0} in Plant {1} for date {2}",
+                [frm.doc.rmc_grade, frm.doc.source_warehouse, frappe.datetime.str_to_user(date)]),
+            indicator: 'orange'
+        });
+    }
+
+    return frm.set_value('mixing_rate', interval ? interval.rate : 0);
+}
+
+function set_raw_materials_from_bom(frm) {
+    frm.clear_table('raw_materials');
+    (frm.rmc_costing.bom_lines || []).forEach(line => {
+        const estimated_qty = flt(line.qty_per_unit) * flt(frm.doc.quantity);
+        frm.add_child('raw_materials', {
+            item_code: line.item_code,
+            item_name: line.item_name,
+            description: line.description,
+            uom: line.stock_uom,
+            rate: line.rate,
+            estimated_qty: estimated_qty,
+            qty: estimated_qty,
+            amount: flt(line.rate) * estimated_qty,
+            variance: 0,
+            variance_percent: 0,
+            conversion_factor: line.conversion_factor
+        });
+    });
+    frm.refresh_field('raw_materials');
+}
+
+function rescale_raw_materials(frm) {
+    if (!frm.doc.bom || !frm.rmc_costing) {
+        return;
+    }
+
+    const lines = {};
+    (frm.rmc_costing.bom_lines || []).forEach(line => {
+        lines[line.item_code] = line;
+    });
+
+    (frm.doc.raw_materials || []).forEach(row => {
+        const line = lines[row.item_code];
+        if (!line) {
+            return;
+        }
+
+        row.estimated_qty = flt(line.qty_per_unit) * flt(frm.doc.quantity);
+        row.qty = row.estimated_qty;
+        row.amount = flt(row.qty) * flt(row.rate);
+        row.variance = 0;
+        row.variance_percent = 0;
+    });
+    frm.refresh_field('raw_materials');
+}
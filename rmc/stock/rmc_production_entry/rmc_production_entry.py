@@ -2,13 +2,43 @@ import frappe
 import json
 from frappe import _
 from frappe.model.document import Document
-from erpnext.accounts.general_ledger import make_gl_entries
-from erpnext.accounts.utils import get_account_currency, get_company_default
+from erpnext.accounts.general_ledger import make_gl_entries, make_reverse_gl_entries
+from erpnext.accounts.utils import get_account_currency
 from erpnext.stock.doctype.stock_entry.stock_entry import StockEntry
-from erpnext.stock.doctype.rmc_production_entry.utils import get_default_cwip_account, get_mixing_expense_account
+from erpnext.stock.doctype.rmc_daily_production_summary.rmc_daily_production_summary import update_daily_summary
+from erpnext.stock.doctype.rmc_grade_rate.rmc_grade_rate import RMCGradeRate
+from erpnext.stock.doctype.rmc_production_entry.availability import validate_stock_availability
+from erpnext.stock.doctype.rmc_production_entry.bulk_status import bulk_update_status
+from erpnext.stock.doctype.rmc_production_entry.cancellation import cancel_linked_vouchers
+from erpnext.stock.doctype.rmc_production_entry.dispatch_dashboard import (
+    record_cancellation,
+    record_submission,
+    record_transition
+)
+from erpnext.stock.doctype.rmc_production_entry.instrumentation import instrument, instrumented
+from erpnext.stock.doctype.rmc_production_entry.posting_queue import enqueue_posting
+from erpnext.stock.doctype.rmc_production_entry.status_events import publish_status_change
+from erpnext.stock.doctype.rmc_status_sla.rmc_status_sla import get_alert_hours
+from erpnext.stock.doctype.rmc_status_transition.rmc_status_transition import log_transitions
+from erpnext.stock.doctype.rmc_production_entry.utils import (
+    PREVIOUS_STATUS,
+    SHIFT_PENDING_STATUS,
+    get_bom_lines,
+    get_company_rmc_context,
+    get_conversion_factor,
+    get_item_details_map,
+    get_posting_schedule,
+    get_transfer_warehouses,
+    get_voucher_mode
+)
 from frappe.utils import flt, getdate, now, time_diff_in_hours, get_datetime
 
 class RMCProductionEntry(Document):
+    def onload(self):
+        if self.docstatus == 1 and self.workflow_state:
+            self.set_onload("alert_hours", get_alert_hours(self.workflow_state, self.company, self.source_warehouse))
+
+    @instrumented("validate")
     def validate(self):
         self.validate_materials()
         self.validate_accounts()
@@ -16,17 +46,16 @@ class RMCProductionEntry(Document):
         self.calculate_costs()
         self.calculate_variances()
 
+    @instrumented("validate_accounts")
     def validate_accounts(self):
         """Ensure required accounts exist"""
         if self.total_mixing_cost:
             # Check accounts before submission
-            cwip_account = get_default_cwip_account(self.company)
-            mixing_expense_account = get_mixing_expense_account(self.company)
-            cost_center = get_company_default(self.company, "cost_center")
+            context = get_company_rmc_context(self.company)
             
-            if not cwip_account or not mixing_expense_account:
+            if not context.cwip_account or not context.mixing_expense_account:
                 frappe.throw(_("Required accounts not set up. Please run account setup first."))
-            if not cost_center:
+            if not context.cost_center:
                 frappe.throw(_("Default cost center not set for company {0}").format(self.company))
 
     def validate_materials(self):
@@ -39,9 +68,10 @@ class RMCProductionEntry(Document):
                 frappe.throw(_("Quantity must be greater than zero for {0}").format(material.item_name))
 
     @frappe.whitelist()
+    @instrumented("get_mixing_rate")
     def get_mixing_rate(self):
         """Get applicable mixing rate for the RMC grade"""
-        self.mixing_rate = frappe.get_attr('erpnext.stock.doctype.rmc_grade_rate.rmc_grade_rate.RMCGradeRate').get_rate(
+        self.mixing_rate = RMCGradeRate.get_rate(
             self.rmc_grade,
             self.production_date,
             self.source_warehouse
@@ -54,83 +84,179 @@ class RMCProductionEntry(Document):
         if not self.bom:
             frappe.throw(_("Please select a BOM first"))
         
-        bom = frappe.get_doc("BOM", self.bom)
+        bom_lines = get_bom_lines(self.bom)
+        if not bom_lines:
+            frappe.throw(_("BOM {0} not found or has no items").format(self.bom))
         
         # Clear existing raw materials
         self.raw_materials = []
+        self._item_details_map = None
         
-        for item in bom.items:
-            # Calculate quantity based on production quantity and BOM quantity
-            estimated_qty = item.qty * (self.quantity / bom.quantity)
+        for line in bom_lines:
+            # Scale the per-unit BOM quantity to the production quantity
+            estimated_qty = line.qty_per_unit * flt(self.quantity)
             
             self.append("raw_materials", {
-                "item_code": item.item_code,
-                "item_name": item.item_name,
-                "description": item.description,
+                "item_code": line.item_code,
+                "item_name": line.item_name,
+                "description": line.description,
                 "estimated_qty": estimated_qty,
                 "qty": estimated_qty,  # Default actual to estimated
                 "variance": 0,
                 "variance_percent": 0,
-                "uom": item.stock_uom,
-                "rate": item.rate,
-                "amount": item.rate * estimated_qty,                
-                "conversion_factor": item.conversion_factor
+                "uom": line.stock_uom,
+                "rate": line.rate,
+                "amount": line.rate * estimated_qty,
+                "conversion_factor": line.conversion_factor
             })
         
         self.calculate_costs()
         return self.raw_materials
 
+    @instrumented("before_submit")
+    def before_submit(self):
+        # Report every shortfall now instead of failing inside the Material Issue
+        validate_stock_availability(self)
+
+    @instrumented("on_submit")
     def on_submit(self):
         self.workflow_state = "Produced"
         self.status_changed_at = now()
-        self.db_set('workflow_state', 'Produced', update_modified=False)
-        self.db_set('status_changed_at', self.status_changed_at)
+
+        production_entry = None
+        posting_schedule = get_posting_schedule()
+        if posting_schedule == "Deferred":
+            # Only record the entry here; the posting worker creates the ledger entries
+            self.posting_status = "Queued"
+            enqueue_posting()
+        elif posting_schedule == "Shift":
+            # Posted with the rest of the shift as consolidated vouchers
+            self.posting_status = SHIFT_PENDING_STATUS
+        else:
+            production_entry = self.create_stock_entries()
+            self.posting_status = "Posted"
+
+        self.db_set({
+            'workflow_state': self.workflow_state,
+            'status_changed_at': self.status_changed_at,
+            'posting_status': self.posting_status,
+            'posting_attempts': 0,
+            'posting_error': None
+        })
+        log_transitions([self], "Draft", self.workflow_state, self.status_changed_at,
+            {self.name: production_entry.name} if production_entry else None)
+        record_submission([self])
+        update_daily_summary(self)
+        publish_status_change([self.name], self.workflow_state, self.status_changed_at)
+
+    def on_cancel(self):
+        # Ledger rows are reversed below rather than blocking the cancellation
+        self.ignore_linked_doctypes = ("GL Entry", "Stock Ledger Entry")
+
+        if not self.flags.linked_vouchers_cancelled:
+            cancel_linked_vouchers([self.name])
+
+        # Mixing charges are posted against this document itself
+        make_reverse_gl_entries(voucher_type=self.doctype, voucher_no=self.name)
+
+        record_cancellation([self])
+        update_daily_summary(self, -1)
+
+    def post_ledger_entries(self):
+        """Create the production ledger entries unless a previous attempt already did"""
+        if frappe.db.exists("Stock Entry", {
+            "rmc_production_entry": self.name,
+            "purpose": ("in", ["Material Issue", "Material Receipt", "Manufacture"]),
+            "docstatus": 1
+        }):
+            return
+
         self.create_stock_entries()
 
     @frappe.whitelist()
-    def update_status(self, status=None):
-        """Update status and create necessary transactions"""
+    @instrumented("update_status")
+    def update_status(self, status=None, transition_key=None):
+        """Update status and create necessary transactions.
+
+        The state change is a compare-and-set on the current state, so of two
+        concurrent requests only one moves the entry. Retrying with the same
+        `transition_key` after it went through is a no-op.
+        """
         if not status:
             return
 
         if self.docstatus != 1:
             frappe.throw(_("Document must be submitted before updating status"))
 
-        if status not in ["Produced", "In-Transit", "Delivered"]:
+        if status not in PREVIOUS_STATUS:
             frappe.throw(_("Invalid status"))
 
-        # Validate status transition
-        valid_transitions = {
-            "Produced": ["In-Transit"],
-            "In-Transit": ["Delivered"]
-        }
+        old_status = PREVIOUS_STATUS[status]
+        transition_key = transition_key or frappe.generate_hash(length=20)
+        status_changed_at = now()
 
-        if self.workflow_state not in valid_transitions or status not in valid_transitions[self.workflow_state]:
-            frappe.throw(_("Cannot change status from {0} to {1}").format(self.workflow_state, status))
+        frappe.db.sql("""
+            UPDATE `tabRMC Production Entry`
+            SET workflow_state = %(status)s, status_changed_at = %(status_changed_at)s,
+                last_transition_key = %(transition_key)s, modified = %(modified)s, modified_by = %(user)s
+            WHERE name = %(name)s AND docstatus = 1 AND workflow_state = %(old_status)s
+                AND IFNULL(posting_status, '') NOT IN ('Queued', 'Failed')
+                AND IFNULL(last_transition_key, '') != %(transition_key)s
+        """, {
+            "name": self.name,
+            "status": status,
+            "old_status": old_status,
+            "status_changed_at": status_changed_at,
+            "transition_key": transition_key,
+            "modified": status_changed_at,
+            "user": frappe.session.user
+        })
+
+        # Our own write is visible here; a concurrent winner's write is not
+        current = frappe.db.get_value(
+            "RMC Production Entry",
+            self.name,
+            ["workflow_state", "posting_status", "status_changed_at", "last_transition_key"],
+            as_dict=1
+        )
+        if current.last_transition_key == transition_key:
+            if get_datetime(current.status_changed_at) != get_datetime(status_changed_at):
+                # An earlier attempt with this key already made the transition
+                return True
+        elif current.posting_status in ("Queued", "Failed"):
+            frappe.throw(_("Production of {0} has not been posted to the ledger yet").format(self.name))
+        else:
+            frappe.throw(_("Cannot change status from {0} to {1}").format(current.workflow_state, status))
+
+        self.workflow_state = status
+        self.status_changed_at = status_changed_at
+        self.last_transition_key = transition_key
+        self.posting_status = current.posting_status
 
-        old_status = self.workflow_state
-        status_changed_at = now()
-        
-        # Update workflow state
-        self.db_set('workflow_state', status, update_modified=False)
-        self.db_set('status_changed_at', status_changed_at)
-        self.notify_update()
-        self.reload()
-        
         # Create appropriate stock entries based on transition
         try:
-            if old_status == "Produced" and status == "In-Transit":
-                self.create_transit_entry()
+            stock_entry = None
+            if self.posting_status == SHIFT_PENDING_STATUS:
+                # The transfer is posted at shift close from the transition log
+                pass
+
+            elif old_status == "Produced" and status == "In-Transit":
+                stock_entry = self.create_transit_entry()
                 frappe.msgprint(_("Created transit stock entry"))
             
             elif old_status == "In-Transit" and status == "Delivered":
-                self.create_delivery_entry()
+                stock_entry = self.create_delivery_entry()
                 frappe.msgprint(_("Created delivery stock entry"))
 
+            log_transitions([self], old_status, status, status_changed_at,
+                {self.name: stock_entry.name} if stock_entry else None)
+            record_transition([self], old_status, status, status_changed_at)
+            publish_status_change([self.name], status, status_changed_at)
             frappe.db.commit()
             return True
         
         except Exception as e:
+            # Also undoes the state change above
             frappe.db.rollback()
             frappe.throw(_("Error creating stock entries: {0}").format(str(e)))
 
@@ -140,13 +266,9 @@ class RMCProductionEntry(Document):
             return None
 
         hours = time_diff_in_hours(now(), get_datetime(self.status_changed_at))
+        alert_hours = get_alert_hours(self.workflow_state, self.company, self.source_warehouse)
         
-        alert_hours = {
-            "Produced": 2,  # Alert after 2 hours
-            "In-Transit": 4  # Alert after 4 hours
-        }
-        
-        if self.workflow_state in alert_hours and hours > alert_hours[self.workflow_state]:
+        if alert_hours and hours > alert_hours:
             return {
                 "hours": hours,
                 "alert": True,
@@ -184,9 +306,26 @@ class RMCProductionEntry(Document):
             else:
                 material.variance_percent = 0
 
+    def get_item_details_map(self):
+        """Item metadata for the RMC grade and every raw material, fetched once per document"""
+        if getattr(self, "_item_details_map", None) is None:
+            self._item_details_map = get_item_details_map(
+                [self.rmc_grade] + [item.item_code for item in self.raw_materials]
+            )
+        return self._item_details_map
+
+    def get_stock_uom(self, item_code):
+        details = self.get_item_details_map().get(item_code)
+        return details.stock_uom if details else None
+
+    @instrumented("create_stock_entries")
     def create_stock_entries(self):
         """Create stock entries for material consumption and RMC production"""
-        cost_center = get_company_default(self.company, "cost_center")
+        if get_voucher_mode() == "Manufacture":
+            return self.create_manufacture_entry()
+
+        cost_center = get_company_rmc_context(self.company).cost_center
+        item_map = self.get_item_details_map()
         posting_date = getdate(self.production_date)
         
         # Material Consumption Entry
@@ -202,19 +341,20 @@ class RMCProductionEntry(Document):
         })
         
         for item in self.raw_materials:
-            item_stock_uom = frappe.db.get_value("Item", item.item_code, "stock_uom")
+            details = item_map.get(item.item_code)
             consumption_entry.append("items", {
                 "item_code": item.item_code,
                 "qty": item.qty,
                 "uom": item.uom,
-                "stock_uom": item_stock_uom,
-                "conversion_factor": 1.0,  # Using 1.0 as default since we're using same UOM
+                "stock_uom": details.stock_uom if details else None,
+                "conversion_factor": get_conversion_factor(details, item.uom),
                 "s_warehouse": self.source_warehouse,
                 "cost_center": cost_center
             })
         
-        consumption_entry.save()
-        consumption_entry.submit()
+        with instrument("consumption_entry", self.source_warehouse):
+            consumption_entry.save()
+            consumption_entry.submit()
         
         # RMC Production Entry
         production_entry = frappe.get_doc({
@@ -231,29 +371,97 @@ class RMCProductionEntry(Document):
         production_entry.append("items", {
             "item_code": self.rmc_grade,
             "qty": self.quantity,            
-            "stock_uom": frappe.db.get_value("Item", self.rmc_grade, "stock_uom"),
+            "stock_uom": self.get_stock_uom(self.rmc_grade),
             "conversion_factor": 1.0,
             "t_warehouse": self.source_warehouse,
             "cost_center": cost_center,
             "basic_rate": self.per_unit_cost
         })
         
-        production_entry.save()
-        production_entry.submit()
+        with instrument("production_entry", self.source_warehouse):
+            production_entry.save()
+            production_entry.submit()
 
         # Create GL Entry for mixing charges if applicable
         if self.total_mixing_cost:
             self.create_mixing_charges_entry()
 
+        return production_entry
+
+    @instrumented("create_manufacture_entry")
+    def create_manufacture_entry(self):
+        """Consume raw materials and receive the RMC grade in a single Manufacture Stock Entry"""
+        context = get_company_rmc_context(self.company)
+        item_map = self.get_item_details_map()
+
+        manufacture_entry = frappe.get_doc({
+            "doctype": "Stock Entry",
+            "stock_entry_type": "Manufacture",
+            "purpose": "Manufacture",
+            "company": self.company,
+            "posting_date": getdate(self.production_date),
+            "posting_time": self.posting_time,
+            "from_bom": 0,
+            "bom_no": self.bom,
+            "fg_completed_qty": self.quantity,
+            "from_warehouse": self.source_warehouse,
+            "to_warehouse": self.source_warehouse,
+            "rmc_production_entry": self.name
+        })
+
+        for item in self.raw_materials:
+            details = item_map.get(item.item_code)
+            manufacture_entry.append("items", {
+                "item_code": item.item_code,
+                "qty": item.qty,
+                "uom": item.uom,
+                "stock_uom": details.stock_uom if details else None,
+                "conversion_factor": get_conversion_factor(details, item.uom),
+                "s_warehouse": self.source_warehouse,
+                "cost_center": context.cost_center
+            })
+
+        manufacture_entry.append("items", {
+            "item_code": self.rmc_grade,
+            "qty": self.quantity,
+            "stock_uom": self.get_stock_uom(self.rmc_grade),
+            "conversion_factor": 1.0,
+            "t_warehouse": self.source_warehouse,
+            "cost_center": context.cost_center,
+            "is_finished_item": 1
+        })
+
+        # Mixing and production charges are valued into the RMC grade instead of
+        # being posted as a separate GL voucher. Production cost is offset against
+        # stock adjustment, like the Material Receipt valuation in Separate mode.
+        for description, amount, expense_account in (
+            (_("Mixing charges for {0}").format(self.name), self.total_mixing_cost, context.mixing_expense_account),
+            (_("Production cost for {0}").format(self.name), self.production_cost, context.stock_adjustment_account)
+        ):
+            if flt(amount):
+                manufacture_entry.append("additional_costs", {
+                    "expense_account": expense_account,
+                    "description": description,
+                    "exchange_rate": 1,
+                    "amount": flt(amount),
+                    "base_amount": flt(amount)
+                })
+
+        manufacture_entry.save()
+        manufacture_entry.submit()
+        return manufacture_entry
+
+    @instrumented("create_mixing_charges_entry")
     def create_mixing_charges_entry(self):
         """Create GL Entry for mixing charges"""
         if not self.total_mixing_cost:
             return
             
         # Get accounts
-        cwip_account = get_default_cwip_account(self.company)
-        mixing_expense_account = get_mixing_expense_account(self.company)
-        cost_center = get_company_default(self.company, "cost_center")
+        context = get_company_rmc_context(self.company)
+        cwip_account = context.cwip_account
+        mixing_expense_account = context.mixing_expense_account
+        cost_center = context.cost_center
         
         gl_entries = []
         precision = frappe.get_precision("GL Entry", "debit")
@@ -318,9 +526,11 @@ class RMCProductionEntry(Document):
         gl_dict.update(args)
         return gl_dict
 
+    @instrumented("create_transit_entry")
     def create_transit_entry(self):
         """Create stock entry for transit movement"""
-        cost_center = get_company_default(self.company, "cost_center")
+        cost_center = get_company_rmc_context(self.company).cost_center
+        source_warehouse, target_warehouse = get_transfer_warehouses(self, "In-Transit")
         
         posting_date = getdate(self.production_date)
         
@@ -337,20 +547,23 @@ class RMCProductionEntry(Document):
         transit_entry.append("items", {
             "item_code": self.rmc_grade,
             "qty": self.quantity,            
-            "stock_uom": frappe.db.get_value("Item", self.rmc_grade, "stock_uom"),
+            "stock_uom": self.get_stock_uom(self.rmc_grade),
             "conversion_factor": 1.0,
-            "s_warehouse": self.source_warehouse,
-            "t_warehouse": "RMC Transit - MKB",
+            "s_warehouse": source_warehouse,
+            "t_warehouse": target_warehouse,
             "cost_center": cost_center,
             "basic_rate": self.per_unit_cost
         })
         
         transit_entry.save()
         transit_entry.submit()
+        return transit_entry
 
+    @instrumented("create_delivery_entry")
     def create_delivery_entry(self):
         """Create stock entry for delivery to site"""
-        cost_center = get_company_default(self.company, "cost_center")
+        cost_center = get_company_rmc_context(self.company).cost_center
+        source_warehouse, target_warehouse = get_transfer_warehouses(self, "Delivered")
         
         posting_date = getdate(self.production_date)
         
@@ -367,16 +580,17 @@ class RMCProductionEntry(Document):
         delivery_entry.append("items", {
             "item_code": self.rmc_grade,
             "qty": self.quantity,            
-            "stock_uom": frappe.db.get_value("Item", self.rmc_grade, "stock_uom"),
+            "stock_uom": self.get_stock_uom(self.rmc_grade),
             "conversion_factor": 1.0,
-            "s_warehouse": "RMC Transit - MKB",
-            "t_warehouse": self.destination_warehouse,
+            "s_warehouse": source_warehouse,
+            "t_warehouse": target_warehouse,
             "cost_center": cost_center,
             "basic_rate": self.per_unit_cost
         })
         
         delivery_entry.save()
         delivery_entry.submit()
+        return delivery_entry
 
 @frappe.whitelist()
 def update_status(docs, status):
@@ -386,40 +600,48 @@ def update_status(docs, status):
         
     if isinstance(docs, str):
         docs = json.loads(docs)
-        
-    success = []
-    failed = []
-    
-    for d in docs:
-        try:
-            doc = frappe.get_doc('RMC Production Entry', d.get('name'))
-            if doc.update_status(status):
-                success.append(d.get('name'))
-            else:
-                failed.append(d.get('name'))
-        except Exception as e:
-            failed.append(d.get('name'))
-            frappe.log_error(f"Failed to update status for {d.get('name')}: {str(e)}")
+
+    frappe.has_permission("RMC Production Entry", "write", throw=True)
+    result = bulk_update_status([d.get("name") for d in docs], status)
             
-    if failed:
+    if result.failed:
         frappe.msgprint(
             _("Status update failed for the following: {0}").format(
-                "<br>".join(failed)
+                "<br>".join(f"{name}: {result.errors[name]}" for name in result.failed)
             ),
             title=_("Status Update Failed"),
             indicator="red"
         )
     
-    if success:
+    if result.success:
         frappe.msgprint(
-            _("Status updated successfully for {0} documents").format(len(success)),
+            _("Status updated successfully for {0} documents").format(len(result.success)),
             indicator="green"
         )
         
-    return {"success": success, "failed": failed}
+    return result
 
 @frappe.whitelist()
-def update_single_status(name, status):
+def get_costing_context(rmc_grade, source_warehouse, bom=None):
+    """Per-unit BOM lines and the rate schedule a form needs to recalculate costs locally"""
+    frappe.has_permission("RMC Production Entry", "read", throw=True)
+
+    schedule = RMCGradeRate.get_rate_schedule(rmc_grade, source_warehouse)
+    return {
+        "bom_lines": get_bom_lines(bom) if bom else [],
+        "rate_schedule": [
+            {"from_date": from_date, "to_date": to_date, "rate": rate}
+            for from_date, to_date, rate in zip(schedule.from_dates, schedule.to_dates, schedule.rates, strict=True)
+        ]
+    }
+
+@frappe.whitelist()
+def update_single_status(name, status, transition_key=None):
     """Update status for a single RMC Production Entry"""
     doc = frappe.get_doc('RMC Production Entry', name)
-    return doc.update_status(status)
+    return doc.update_status(status, transition_key)
+
+def on_doctype_update():
+    frappe.db.add_index("RMC Production Entry", ["posting_status", "production_date", "posting_time"])
+    frappe.db.add_index("RMC Production Entry", ["workflow_state", "status_changed_at"])
+    frappe.db.add_index("RMC Production Entry", ["company", "production_date"])
@@ -1,15 +1,28 @@
+// Selections larger than this are updated by background jobs
+const BACKGROUND_STATUS_UPDATE_THRESHOLD = 50;
+
 frappe.listview_settings['RMC Production Entry'] = {
-    add_fields: ["workflow_state", "docstatus", "status_changed_at"],
+    add_fields: ["workflow_state", "docstatus", "status_changed_at", "company", "source_warehouse", "posting_status"],
+
+    // Status SLA thresholds, loaded once in onload
+    alert_hours_map: {
+        defaults: { "Produced": 2, "In-Transit": 4 },
+        rules: []
+    },
+
+    get_alert_hours: function(doc) {
+        const map = frappe.listview_settings['RMC Production Entry'].alert_hours_map;
+        const matches = map.rules.filter(d => d.workflow_state === doc.workflow_state && d.company === doc.company);
+        const rule = matches.find(d => d.warehouse === doc.source_warehouse) || matches.find(d => !d.warehouse);
+        return rule ? rule.alert_hours : map.defaults[doc.workflow_state];
+    },
     
     get_indicator: function(doc) {
         const hours = doc.status_changed_at ? 
             frappe.datetime.get_hour_diff(frappe.datetime.now_datetime(), doc.status_changed_at) : 
             0;
 
-        const alert_hours = {
-            "Produced": 2,
-            "In-Transit": 4
-        };
+        const alert_hours = frappe.listview_settings['RMC Production Entry'].get_alert_hours(doc);
 
         const status = doc.workflow_state;
         let color = "gray";
@@ -20,9 +33,9 @@ frappe.listview_settings['RMC Production Entry'] = {
         
         // Determine color based on status and hours
         if (status === "Produced") {
-            color = hours > alert_hours[status] ? "red" : "blue";
+            color = hours > alert_hours ? "red" : "blue";
         } else if (status === "In-Transit") {
-            color = hours > alert_hours[status] ? "red" : "orange";
+            color = hours > alert_hours ? "red" : "orange";
         } else if (status === "Delivered") {
             color = "green";
         }
@@ -32,17 +45,107 @@ frappe.listview_settings['RMC Production Entry'] = {
     },
 
     onload(listview) {
+        frappe.xcall('erpnext.stock.doctype.rmc_production_entry.aging.get_alert_hours_map').then((map) => {
+            frappe.listview_settings['RMC Production Entry'].alert_hours_map = map;
+            // Re-render indicators from the rows already loaded
+            listview.render();
+        });
+
+        // Progress of background status updates started from this list
+        frappe.realtime.off('rmc_status_update_progress', listview.rmc_status_update_progress_handler);
+        listview.rmc_status_update_progress_handler = (data) => {
+            frappe.show_progress(
+                __("Updating Status to {0}", [data.status]),
+                data.processed,
+                data.total,
+                __("{0} of {1} documents processed", [data.processed, data.total])
+            );
+
+            if (data.done) {
+                frappe.hide_progress();
+                if (data.failed.length) {
+                    frappe.msgprint({
+                        title: __("Status Update Partially Failed"),
+                        message: __("Failed to update status for: {0}", [data.failed.join("<br>")]),
+                        indicator: "orange"
+                    });
+                } else {
+                    frappe.show_alert({
+                        message: __("Status updated successfully for {0} documents", [data.success]),
+                        indicator: "green"
+                    });
+                }
+                listview.refresh();
+            }
+        };
+        frappe.realtime.on('rmc_status_update_progress', listview.rmc_status_update_progress_handler);
+
+        // Progress of ticket imports started by this user, published after every chunk
+        frappe.realtime.off('rmc_ticket_import_progress', listview.rmc_ticket_import_progress_handler);
+        listview.rmc_ticket_import_progress_handler = (data) => {
+            frappe.show_progress(
+                __("Importing Tickets"),
+                data.processed,
+                data.total,
+                __("{0} of {1} tickets processed", [data.processed, data.total])
+            );
+
+            if (data.done) {
+                frappe.hide_progress();
+                const errors = Object.keys(data.errors || {});
+                if (errors.length || (data.duplicates || []).length) {
+                    frappe.msgprint({
+                        title: __("Ticket Import Finished with Issues"),
+                        message: [
+                            __("{0} tickets imported", [data.imported]),
+                            data.duplicates.length ? __("Skipped duplicates: {0}", [data.duplicates.join(", ")]) : "",
+                            ...errors.map(ticket => `${ticket}: ${data.errors[ticket]}`)
+                        ].filter(Boolean).join("<br>"),
+                        indicator: "orange"
+                    });
+                } else {
+                    frappe.show_alert({
+                        message: __("{0} tickets imported", [data.imported]),
+                        indicator: "green"
+                    });
+                }
+                listview.refresh();
+            }
+        };
+        frappe.realtime.on('rmc_ticket_import_progress', listview.rmc_ticket_import_progress_handler);
+
         // Add refresh handler
         listview.page.wrapper.on('page-change', () => {
             listview.refresh();
         });
 
-        // Add refresh every 5 minutes for status age
-        setInterval(() => {
-            if (listview.page.wrapper.is(':visible')) {
-                listview.refresh();
+        // Patch rows moved by any user in place instead of reloading the list.
+        // Only this list's own handler is removed; open forms keep theirs.
+        frappe.realtime.off('rmc_status_change', listview.rmc_status_change_handler);
+        listview.rmc_status_change_handler = (data) => {
+            let changed = false;
+            (listview.data || []).forEach(row => {
+                if (data.names.includes(row.name)) {
+                    row.workflow_state = data.workflow_state;
+                    row.status_changed_at = data.status_changed_at;
+                    changed = true;
+                }
+            });
+
+            if (changed) {
+                listview.render();
             }
-        }, 300000); // 5 minutes
+        };
+        frappe.realtime.on('rmc_status_change', listview.rmc_status_change_handler);
+
+        // Status age in the indicators is computed in the browser; re-render it every 5 minutes
+        if (!listview.rmc_age_timer) {
+            listview.rmc_age_timer = setInterval(() => {
+                if (listview.page.wrapper.is(':visible')) {
+                    listview.render();
+                }
+            }, 300000);
+        }
 
         // Add bulk update button
         listview.page.add_inner_button(__("Set Status"), () => {
@@ -93,6 +196,27 @@ frappe.listview_settings['RMC Production Entry'] = {
                 ],
                 primary_action_label: __("Update"),
                 primary_action(values) {
+                    const checked = listview.get_checked_items();
+                    if (checked.length > BACKGROUND_STATUS_UPDATE_THRESHOLD) {
+                        frappe.call({
+                            method: 'erpnext.stock.doctype.rmc_production_entry.bulk_status.enqueue_update_status',
+                            args: {
+                                docs: JSON.stringify(checked.map(d => ({ name: d.name }))),
+                                status: values.status
+                            },
+                            callback: (r) => {
+                                if (!r.exc && r.message) {
+                                    dialog.hide();
+                                    frappe.show_alert({
+                                        message: __("Updating status of {0} documents in the background", [r.message.total]),
+                                        indicator: "blue"
+                                    });
+                                }
+                            }
+                        });
+                        return;
+                    }
+
                     frappe.call({
                         method: 'erpnext.stock.doctype.rmc_production_entry.rmc_production_entry.update_status',
                         args: {
@@ -133,5 +257,115 @@ frappe.listview_settings['RMC Production Entry'] = {
 
             dialog.show();
         });
+
+        // Post tickets captured under the "Shift" posting schedule as consolidated vouchers
+        if (frappe.user.has_role("Stock Manager")) {
+            listview.page.add_menu_item(__("Close Shift"), () => {
+                frappe.prompt([
+                    {
+                        fieldname: "company",
+                        label: __("Company"),
+                        fieldtype: "Link",
+                        options: "Company",
+                        default: frappe.defaults.get_user_default("Company"),
+                        reqd: 1
+                    },
+                    {
+                        fieldname: "plant",
+                        label: __("Plant"),
+                        fieldtype: "Link",
+                        options: "Warehouse"
+                    }
+                ], (values) => {
+                    frappe.xcall('erpnext.stock.doctype.rmc_shift_posting.rmc_shift_posting.close_shift', values).then(() => {
+                        frappe.show_alert({
+                            message: __("Posting the shift in the background"),
+                            indicator: "blue"
+                        });
+                    });
+                }, __("Close Shift"), __("Close"));
+            });
+        }
+
+        // Check raw material stock for a batch of drafts, netting their combined demand
+        listview.page.add_inner_button(__("Check Stock"), () => {
+            const checked = listview.get_checked_items();
+            if (!checked.length || checked.some(d => d.docstatus !== 0)) {
+                frappe.msgprint(__("Please select only draft documents"));
+                return;
+            }
+
+            frappe.xcall('erpnext.stock.doctype.rmc_production_entry.availability.check_stock_availability', {
+                docs: JSON.stringify(checked.map(d => ({ name: d.name })))
+            }).then((shortfalls) => {
+                if (!shortfalls.length) {
+                    frappe.show_alert({
+                        message: __("Enough stock for all {0} documents", [checked.length]),
+                        indicator: "green"
+                    });
+                    return;
+                }
+
+                frappe.msgprint({
+                    title: __("Insufficient Stock"),
+                    message: shortfalls.map(d => __("{0} in {1}: {2} required, {3} available ({4})", [
+                        d.item_code, d.warehouse, format_number(d.required_qty), format_number(d.available_qty),
+                        d.entries.join(", ")
+                    ])).join("<br>"),
+                    indicator: "orange"
+                });
+            });
+        });
+
+        // Put entries whose posting ran out of attempts back on the posting queue
+        listview.page.add_inner_button(__("Retry Posting"), () => {
+            const checked = listview.get_checked_items();
+            if (!checked.length || checked.some(d => d.posting_status !== "Failed")) {
+                frappe.msgprint(__("Please select only documents whose posting failed"));
+                return;
+            }
+
+            frappe.xcall('erpnext.stock.doctype.rmc_production_entry.posting_queue.requeue_failed_postings', {
+                docs: JSON.stringify(checked.map(d => ({ name: d.name })))
+            }).then((requeued) => {
+                frappe.show_alert({
+                    message: __("Queued {0} documents for posting", [requeued.length]),
+                    indicator: "blue"
+                });
+                listview.refresh();
+            });
+        });
+
+        // Cancel selected entries together, so transfers they share are reversed once
+        listview.page.add_inner_button(__("Cancel with Vouchers"), () => {
+            const checked = listview.get_checked_items();
+            if (!checked.length || checked.some(d => d.docstatus !== 1)) {
+                frappe.msgprint(__("Please select only submitted documents"));
+                return;
+            }
+
+            frappe.confirm(
+                __("Cancel {0} documents and all their stock entries?", [checked.length]),
+                () => {
+                    frappe.call({
+                        method: 'erpnext.stock.doctype.rmc_production_entry.cancellation.cancel_entries',
+                        args: {
+                            docs: JSON.stringify(checked.map(d => ({ name: d.name })))
+                        },
+                        freeze: true,
+                        freeze_message: __("Cancelling..."),
+                        callback: (r) => {
+                            if (!r.exc) {
+                                frappe.show_alert({
+                                    message: __("Cancelled {0} documents", [r.message.length]),
+                                    indicator: "green"
+                                });
+                                listview.refresh();
+                            }
+                        }
+                    });
+                }
+            );
+        });
     }
 };
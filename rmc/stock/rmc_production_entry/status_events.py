@@ -0,0 +1,19 @@
+import frappe
+
+STATUS_CHANGE_EVENT = "rmc_status_change"
+
+def publish_status_change(names, status, status_changed_at):
+    """Push a workflow state change to open list views and forms once the transaction commits"""
+    if not names:
+        return
+
+    frappe.publish_realtime(
+        STATUS_CHANGE_EVENT,
+        {
+            "names": list(names),
+            "workflow_state": status,
+            "status_changed_at": str(status_changed_at)
+        },
+        doctype="RMC Production Entry",
+        after_commit=True
+    )
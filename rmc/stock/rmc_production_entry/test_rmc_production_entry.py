@@ -0,0 +1,35 @@
+from frappe.tests.utils import FrappeTestCase
+from erpnext.stock.doctype.rmc_production_entry.instrumentation import (
+    histogram_percentile,
+    make_histogram,
+    merge_histograms
+)
+from erpnext.stock.doctype.rmc_production_entry.utils import percentile
+
+class TestRMCProductionEntry(FrappeTestCase):
+    def test_percentile(self):
+        self.assertEqual(percentile([], 50), 0)
+        self.assertEqual(percentile([7], 99), 7)
+
+        # Nearest rank: the ceil(q / 100 * n)-th smallest value
+        self.assertEqual(percentile([4, 1, 3, 2], 50), 2)
+        self.assertEqual(percentile(list(range(1, 21)), 95), 19)
+        self.assertEqual(percentile(list(range(1, 101)), 99), 99)
+
+        # q = 0 and q = 100 give the smallest and largest values
+        self.assertEqual(percentile([4, 1, 3, 2], 0), 1)
+        self.assertEqual(percentile([4, 1, 3, 2], 100), 4)
+
+    def test_merged_histogram_percentile(self):
+        first_hour = [1.0] * 90
+        second_hour = [100.0] * 10
+        histogram = merge_histograms([make_histogram(first_hour), make_histogram(second_hour)])
+
+        # Within one bucket (5%) of the exact percentile of all samples together
+        for q in (50, 95, 99):
+            exact = percentile(first_hour + second_hour, q)
+            self.assertGreaterEqual(histogram_percentile(histogram, q), exact)
+            self.assertLessEqual(histogram_percentile(histogram, q), exact * 1.05)
+
+        self.assertEqual(histogram_percentile(histogram, 99, max_ms=100.0), 100.0)
+        self.assertEqual(histogram_percentile({}, 50), 0)
@@ -0,0 +1,239 @@
+import csv
+import frappe
+import json
+import os
+from itertools import groupby
+from frappe import _
+from frappe.utils import cint, flt, nowtime
+from erpnext.stock.doctype.rmc_grade_rate.rmc_grade_rate import get_rate_schedule
+from erpnext.stock.doctype.rmc_production_entry.utils import (
+    get_bom_lines_map,
+    get_conversion_factor,
+    get_item_details_map
+)
+
+# Tickets built, validated and committed together; bounds memory on large files
+IMPORT_CHUNK_SIZE = 100
+IMPORT_PROGRESS_EVENT = "rmc_ticket_import_progress"
+
+TICKET_FIELDS = (
+    "ticket_number", "company", "production_date", "posting_time", "rmc_grade", "bom",
+    "quantity", "lorry_number", "driver_name", "source_warehouse", "destination_warehouse"
+)
+
+@frappe.whitelist()
+def import_tickets(file_url, submit=0):
+    """Import a batching controller export attached as a File in the background.
+
+    Supported formats: CSV with one row per ticket material (ticket columns
+    repeated, plus `item_code` and `qty`), or JSON Lines with one ticket per
+    line and a `materials` list. Both are read a ticket at a time.
+    """
+    frappe.has_permission("RMC Production Entry", "create", throw=True)
+    if cint(submit):
+        frappe.has_permission("RMC Production Entry", "submit", throw=True)
+
+    path = get_import_file_path(file_url)
+    validate_import_file_type(path)
+    frappe.enqueue(
+        run_ticket_import,
+        queue="long",
+        timeout=3600,
+        enqueue_after_commit=True,
+        file_url=file_url,
+        submit=cint(submit)
+    )
+
+def run_ticket_import(file_url, submit=0):
+    """Stream tickets from the file and import them chunk by chunk"""
+    path = get_import_file_path(file_url)
+    summary = frappe._dict(imported=[], duplicates=[], errors={}, processed=0)
+    seen_tickets = set()
+
+    # A first streaming pass only counts tickets, so progress can show a total
+    total = sum(1 for _ticket in read_tickets(path))
+
+    chunk = []
+    for ticket in read_tickets(path):
+        chunk.append(ticket)
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            import_ticket_chunk(chunk, cint(submit), seen_tickets, summary)
+            publish_import_progress(file_url, summary, total)
+            chunk = []
+
+    if chunk:
+        import_ticket_chunk(chunk, cint(submit), seen_tickets, summary)
+
+    publish_import_progress(file_url, summary, total, done=True)
+    return summary
+
+def publish_import_progress(file_url, summary, total, done=False):
+    progress = {
+        "file_url": file_url,
+        "processed": summary.processed,
+        "total": total,
+        "imported": len(summary.imported),
+        "done": done
+    }
+    if done:
+        progress.update(duplicates=summary.duplicates, errors=summary.errors)
+
+    frappe.publish_realtime(IMPORT_PROGRESS_EVENT, progress, user=frappe.session.user)
+
+def get_import_file_path(file_url):
+    file_name = frappe.db.get_value("File", {"file_url": file_url})
+    if not file_name:
+        frappe.throw(_("File {0} not found").format(file_url))
+    return frappe.get_doc("File", file_name).get_full_path()
+
+def validate_import_file_type(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in (".csv", ".jsonl", ".ndjson"):
+        frappe.throw(_("Unsupported file type {0}. Use CSV or JSON Lines.").format(extension))
+    return extension
+
+def read_tickets(path):
+    """Yield one ticket dict at a time from a CSV or JSON Lines file"""
+    extension = validate_import_file_type(path)
+
+    if extension == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            rows = csv.DictReader(f)
+            # Material rows of a ticket are consecutive in controller exports
+            for _ticket_number, ticket_rows in groupby(rows, key=lambda row: (row.get("ticket_number") or "").strip()):
+                ticket_rows = list(ticket_rows)
+                ticket = {field: (ticket_rows[0].get(field) or "").strip() for field in TICKET_FIELDS}
+                ticket["materials"] = [
+                    {"item_code": row["item_code"].strip(), "qty": row.get("qty")}
+                    for row in ticket_rows
+                    if (row.get("item_code") or "").strip()
+                ]
+                yield ticket
+
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+def import_ticket_chunk(tickets, submit, seen_tickets, summary):
+    """Validate a chunk of tickets with batch lookups, insert them and commit"""
+    summary.processed += len(tickets)
+    ticket_numbers = [str(d.get("ticket_number") or "").strip() for d in tickets]
+    existing = set(frappe.get_all(
+        "RMC Production Entry",
+        filters={"ticket_number": ("in", [d for d in ticket_numbers if d]), "docstatus": ("<", 2)},
+        pluck="ticket_number"
+    )) if any(ticket_numbers) else set()
+
+    pending = []
+    for ticket_number, ticket in zip(ticket_numbers, tickets, strict=True):
+        if not ticket_number:
+            summary.errors[f"#{len(summary.errors) + 1}"] = _("Ticket Number is required")
+        elif ticket_number in existing or ticket_number in seen_tickets:
+            summary.duplicates.append(ticket_number)
+        else:
+            seen_tickets.add(ticket_number)
+            pending.append((ticket_number, ticket))
+
+    docs = []
+    for ticket_number, ticket in pending:
+        doc = frappe.new_doc("RMC Production Entry")
+        doc.update({field: ticket.get(field) for field in TICKET_FIELDS if ticket.get(field)})
+        doc.posting_time = doc.posting_time or nowtime()
+        doc.quantity = flt(doc.quantity)
+        docs.append((ticket_number, ticket, doc))
+
+    bom_map = get_default_bom_map({doc.rmc_grade for _ticket_number, _ticket, doc in docs if not doc.bom})
+    for _ticket_number, _ticket, doc in docs:
+        doc.bom = doc.bom or bom_map.get(doc.rmc_grade)
+
+    bom_lines = get_bom_lines_map({doc.bom for _ticket_number, _ticket, doc in docs if doc.bom})
+    item_map = get_item_details_map(
+        [d.get("item_code") for _ticket_number, ticket, _doc in docs for d in ticket.get("materials") or []]
+    )
+
+    for ticket_number, ticket, doc in docs:
+        error = build_ticket(doc, ticket, bom_lines, item_map)
+        if error:
+            summary.errors[ticket_number] = error
+            continue
+
+        savepoint = f"rmc_import_{frappe.generate_hash(length=8)}"
+        frappe.db.savepoint(savepoint)
+        try:
+            doc.insert()
+            if submit:
+                doc.submit()
+            summary.imported.append(doc.name)
+        except Exception as e:
+            frappe.db.rollback(save_point=savepoint)
+            summary.errors[ticket_number] = str(e)
+
+    frappe.db.commit()
+
+def build_ticket(doc, ticket, bom_lines, item_map):
+    """Fill raw materials and mixing rate in memory; return an error message if the ticket is invalid"""
+    for field in ("company", "production_date", "rmc_grade", "lorry_number", "source_warehouse", "destination_warehouse"):
+        if not doc.get(field):
+            return _("{0} is required").format(doc.meta.get_label(field))
+
+    if doc.quantity <= 0:
+        return _("Quantity must be greater than zero")
+
+    if not doc.bom or doc.bom not in bom_lines:
+        return _("No active BOM found for {0}").format(doc.rmc_grade)
+
+    doc.mixing_rate = get_rate_schedule(doc.rmc_grade, doc.source_warehouse).lookup(doc.production_date)
+    if not doc.mixing_rate:
+        return _("No mixing rate found for {0} in Plant {1} for date {2}").format(
+            doc.rmc_grade, doc.source_warehouse, doc.production_date
+        )
+
+    actual_qty = {}
+    for material in ticket.get("materials") or []:
+        actual_qty[material.get("item_code")] = actual_qty.get(material.get("item_code"), 0) + flt(material.get("qty"))
+
+    for line in bom_lines[doc.bom]:
+        estimated_qty = line.qty_per_unit * doc.quantity
+        qty = actual_qty.pop(line.item_code, estimated_qty)
+        doc.append("raw_materials", {
+            "item_code": line.item_code,
+            "item_name": line.item_name,
+            "description": line.description,
+            "estimated_qty": estimated_qty,
+            "qty": qty,
+            "uom": line.stock_uom,
+            "rate": line.rate,
+            "amount": line.rate * qty,
+            "conversion_factor": line.conversion_factor
+        })
+
+    # Materials weighed by the controller that are not part of the mix design
+    for item_code, qty in actual_qty.items():
+        details = item_map.get(item_code)
+        if not details:
+            return _("Item {0} not found").format(item_code)
+        doc.append("raw_materials", {
+            "item_code": item_code,
+            "item_name": details.item_name,
+            "description": details.description,
+            "estimated_qty": 0,
+            "qty": qty,
+            "uom": details.stock_uom,
+            "rate": 0,
+            "amount": 0,
+            "conversion_factor": get_conversion_factor(details, details.stock_uom)
+        })
+
+def get_default_bom_map(rmc_grades):
+    """Default active BOM of each RMC grade"""
+    if not rmc_grades:
+        return {}
+
+    boms = frappe.get_all(
+        "BOM",
+        filters={"item": ("in", list(rmc_grades)), "is_active": 1, "is_default": 1, "docstatus": 1},
+        fields=["name", "item"]
+    )
+    return {d.item: d.name for d in boms}
@@ -1,8 +1,61 @@
 import frappe
+import math
 from frappe import _
+from frappe.utils import flt
+
+RMC_TRANSIT_WAREHOUSE = "RMC Transit - MKB"
+
+# Allowed workflow_state moves after submit, and the state each one starts from
+VALID_STATUS_TRANSITIONS = {
+    "Produced": ["In-Transit"],
+    "In-Transit": ["Delivered"]
+}
+PREVIOUS_STATUS = {
+    next_status: status
+    for status, next_statuses in VALID_STATUS_TRANSITIONS.items()
+    for next_status in next_statuses
+}
+
+# How production is posted on submit, set by the `rmc_voucher_mode` site config:
+# "Separate" posts a Material Issue, a Material Receipt and a mixing charges GL entry,
+# "Manufacture" posts one Manufacture Stock Entry with mixing charges as additional costs.
+VOUCHER_MODES = ("Separate", "Manufacture")
+
+def get_voucher_mode():
+    mode = frappe.conf.get("rmc_voucher_mode") or "Separate"
+    if mode not in VOUCHER_MODES:
+        frappe.throw(_("Invalid rmc_voucher_mode {0} in site config").format(mode))
+    return mode
+
+# When production is posted, set by the `rmc_posting_schedule` site config:
+# "Immediate" posts the ledger entries inside submit, "Deferred" queues them
+# for the posting worker so submit returns straight away, and "Shift" leaves
+# production and transfers pending until the shift is closed, when they are
+# posted as consolidated vouchers (see RMC Shift Posting).
+POSTING_SCHEDULES = ("Immediate", "Deferred", "Shift")
+
+# posting_status of entries waiting for their shift to be closed
+SHIFT_PENDING_STATUS = "Pending Shift"
+
+def get_posting_schedule():
+    schedule = frappe.conf.get("rmc_posting_schedule") or "Immediate"
+    if schedule not in POSTING_SCHEDULES:
+        frappe.throw(_("Invalid rmc_posting_schedule {0} in site config").format(schedule))
+    return schedule
+
+def get_transfer_warehouses(entry, status):
+    """Source and target warehouse of the stock transfer made when `entry` moves to `status`"""
+    if status == "In-Transit":
+        return entry.source_warehouse, RMC_TRANSIT_WAREHOUSE
+    if status == "Delivered":
+        return RMC_TRANSIT_WAREHOUSE, entry.destination_warehouse
 
 def setup_accounts(company):
-    """Setup required accounts for RMC Production Entry"""
+    """Create the accounts RMC Production Entry posts to, if missing; returns the accounts created.
+
+    Runs at install, migrate and Company save time only. It neither commits
+    nor messages, so it is safe inside the caller's transaction.
+    """
     if not company:
         frappe.throw(_("Company is required"))
         
@@ -10,16 +63,6 @@ def setup_accounts(company):
     if not abbr:
         frappe.throw(_("Company abbreviation not found"))
 
-    # Check parent accounts exist
-    parent_accounts = [
-        f"Application of Funds (Assets) - {abbr}",
-        f"Direct Expenses - {abbr}"
-    ]
-    
-    for parent in parent_accounts:
-        if not frappe.db.exists("Account", parent):
-            frappe.throw(_("Parent account {0} not found. Please set up standard accounts first.").format(parent))
-    
     accounts_to_create = [
         {
             "account_name": "Capital Work in Progress",
@@ -36,68 +79,268 @@ def setup_accounts(company):
             "root_type": "Expense"
         }
     ]
+
+    existing = get_existing_accounts(
+        [acc["parent_account"] for acc in accounts_to_create]
+        + [f"{acc['account_name']} - {abbr}" for acc in accounts_to_create]
+    )
+
+    # Check parent accounts exist
+    for acc in accounts_to_create:
+        if acc["parent_account"] not in existing:
+            frappe.throw(_("Parent account {0} not found. Please set up standard accounts first.").format(acc["parent_account"]))
     
     created_accounts = []
     for acc in accounts_to_create:
         account_name = f"{acc['account_name']} - {abbr}"
-        if not frappe.db.exists("Account", account_name):
-            try:
-                new_account = frappe.get_doc({
-                    "doctype": "Account",
-                    "account_name": acc["account_name"],
-                    "parent_account": acc["parent_account"],
-                    "account_type": acc["account_type"],
-                    "root_type": acc["root_type"],
-                    "company": company,
-                    "is_group": acc["is_group"]
-                })
-                new_account.insert()
-                created_accounts.append(account_name)
-                
-                if acc["account_name"] == "Capital Work in Progress":
-                    frappe.db.set_value(
-                        "Company", 
-                        company, 
-                        "capital_work_in_progress_account", 
-                        account_name
-                    )
-            except Exception as e:
-                frappe.log_error(f"Error creating account {account_name}: {str(e)}")
-                frappe.throw(_("Error creating account {0}: {1}").format(account_name, str(e)))
-    
-    if created_accounts:
-        frappe.msgprint(_("Created accounts: {0}").format(", ".join(created_accounts)))
-    
-    frappe.db.commit()
+        if account_name not in existing:
+            new_account = frappe.get_doc({
+                "doctype": "Account",
+                "account_name": acc["account_name"],
+                "parent_account": acc["parent_account"],
+                "account_type": acc["account_type"],
+                "root_type": acc["root_type"],
+                "company": company,
+                "is_group": acc["is_group"]
+            })
+            new_account.insert(ignore_permissions=True)
+            created_accounts.append(account_name)
+            
+            if acc["account_name"] == "Capital Work in Progress":
+                frappe.db.set_value(
+                    "Company", 
+                    company, 
+                    "capital_work_in_progress_account", 
+                    account_name
+                )
+
+    return created_accounts
+
+def provision_accounts(companies=None):
+    """Set up RMC accounts for `companies`, or all companies; failures are logged, not raised"""
+    for company in companies or frappe.get_all("Company", pluck="name"):
+        savepoint = f"rmc_accounts_{frappe.generate_hash(length=8)}"
+        frappe.db.savepoint(savepoint)
+        try:
+            setup_accounts(company)
+        except Exception:
+            frappe.db.rollback(save_point=savepoint)
+            frappe.log_error(title=f"RMC account setup failed for {company}")
+
+def provision_company_accounts(doc, method=None):
+    """doc_events hook for Company: new companies get their RMC accounts on save"""
+    provision_accounts([doc.name])
+
+class CompanyRMCContext:
+    """Company abbreviation, default cost center, stock adjustment and RMC accounts, resolved once per company.
+
+    Contexts live in a redis hash shared by all workers, with frappe.local as the
+    request-scoped layer in front of it. Company and Account changes drop them.
+    """
+
+    CACHE_KEY = "rmc_company_context"
+
+    __slots__ = (
+        "abbr", "company", "cost_center", "cwip_account", "mixing_expense_account", "stock_adjustment_account"
+    )
+
+    def __init__(self, company, abbr, cost_center, stock_adjustment_account, cwip_account, mixing_expense_account):
+        self.company = company
+        self.abbr = abbr
+        self.cost_center = cost_center
+        self.stock_adjustment_account = stock_adjustment_account
+        self.cwip_account = cwip_account
+        self.mixing_expense_account = mixing_expense_account
+
+    @classmethod
+    def get(cls, company):
+        if not company:
+            frappe.throw(_("Company is required"))
+
+        context = frappe.cache().hget(cls.CACHE_KEY, company, generator=lambda: cls.resolve(company))
+        return cls(**context)
+
+    @staticmethod
+    def resolve(company):
+        """Read the company defaults and check the RMC accounts exist"""
+        company_details = frappe.db.get_value(
+            "Company", company, ["abbr", "cost_center", "stock_adjustment_account"], as_dict=1
+        )
+        if not company_details or not company_details.abbr:
+            frappe.throw(_("Company abbreviation not found"))
+
+        abbr = company_details.abbr
+        accounts = {
+            "cwip_account": f"Capital Work in Progress - {abbr}",
+            "mixing_expense_account": f"RMC Mixing Expenses - {abbr}"
+        }
+
+        # Accounts are provisioned at install, migrate and Company save, never here
+        existing = get_existing_accounts(accounts.values())
+        for account in accounts.values():
+            if account not in existing:
+                frappe.throw(_("Account {0} not found. Save Company {1} or run bench migrate to create it.").format(
+                    account, company
+                ))
+
+        return dict(
+            company=company,
+            abbr=abbr,
+            cost_center=company_details.cost_center,
+            stock_adjustment_account=company_details.stock_adjustment_account,
+            **accounts
+        )
+
+    @classmethod
+    def clear(cls, company=None):
+        if company:
+            frappe.cache().hdel(cls.CACHE_KEY, company)
+        else:
+            frappe.cache().delete_value(cls.CACHE_KEY)
+
+def get_existing_accounts(accounts):
+    return set(frappe.get_all("Account", filters={"name": ("in", list(accounts))}, pluck="name"))
+
+def get_company_rmc_context(company):
+    """Get the cached accounting context for RMC postings of a company"""
+    return CompanyRMCContext.get(company)
+
+def clear_company_rmc_context(doc, method=None):
+    """doc_events hook for Company and Account"""
+    company = doc.name if doc.doctype == "Company" else doc.get("company")
+    CompanyRMCContext.clear(company)
 
 def get_default_cwip_account(company):
-    """Get or create Capital Work in Progress account"""
-    if not company:
-        frappe.throw(_("Company is required"))
-        
-    abbr = frappe.get_value('Company', company, 'abbr')
-    cwip_account = f"Capital Work in Progress - {abbr}"
-    
-    if not frappe.db.exists("Account", cwip_account):
-        setup_accounts(company)
-        
-    if not frappe.db.exists("Account", cwip_account):
-        frappe.throw(_("Could not find or create Capital Work in Progress account"))
-    
-    return cwip_account
+    """Get the Capital Work in Progress account"""
+    return get_company_rmc_context(company).cwip_account
 
 def get_mixing_expense_account(company):
-    """Get or create RMC Mixing Expenses account"""
-    if not company:
-        frappe.throw(_("Company is required"))
-        
-    abbr = frappe.get_value('Company', company, 'abbr')
-    mixing_account = f"RMC Mixing Expenses - {abbr}"
-    
-    if not frappe.db.exists("Account", mixing_account):
-        setup_accounts(company)
-        
-    if not frappe.db.exists("Account", mixing_account):
-        frappe.throw(_("Could not find or create RMC Mixing Expenses account"))
-    
-    return mixing_account
+    """Get the RMC Mixing Expenses account"""
+    return get_company_rmc_context(company).mixing_expense_account
+
+def get_item_details_map(item_codes):
+    """Fetch stock UOM, item name and UOM conversion factors for many items in one query"""
+    item_codes = list({d for d in item_codes if d})
+    if not item_codes:
+        return {}
+
+    rows = frappe.db.sql("""
+        SELECT
+            item.name AS item_code, item.item_name, item.description, item.stock_uom,
+            uom.uom, uom.conversion_factor
+        FROM `tabItem` item
+        LEFT JOIN `tabUOM Conversion Detail` uom
+            ON uom.parent = item.name AND uom.parenttype = 'Item'
+        WHERE item.name IN %(item_codes)s
+    """, {"item_codes": item_codes}, as_dict=1)
+
+    item_map = {}
+    for row in rows:
+        details = item_map.setdefault(row.item_code, frappe._dict({
+            "item_code": row.item_code,
+            "item_name": row.item_name,
+            "description": row.description,
+            "stock_uom": row.stock_uom,
+            "conversion_factors": {row.stock_uom: 1.0}
+        }))
+        if row.uom:
+            details.conversion_factors[row.uom] = flt(row.conversion_factor) or 1.0
+
+    return item_map
+
+def get_conversion_factor(item_details, uom):
+    """Conversion factor from `uom` to the item's stock UOM, defaulting to 1"""
+    if not item_details or not uom:
+        return 1.0
+    return item_details.conversion_factors.get(uom, 1.0)
+
+BOM_LINES_CACHE_KEY = "rmc_bom_lines"
+
+def get_bom_lines(bom):
+    """Normalized per-unit raw material lines of a BOM"""
+    return get_bom_lines_map([bom]).get(bom) or []
+
+def get_bom_lines_map(boms):
+    """Per-unit raw material lines of many submitted BOMs.
+
+    Cached lines are versioned by the latest `modified` of the BOM and its
+    items, checked with one query on every call, so cost updates written with
+    db_set or db_update are picked up even though they fire no doc_events.
+
+    Each line holds item_code, item_name, description, stock_uom, rate,
+    conversion_factor and qty_per_unit (BOM item qty / BOM quantity), so
+    scaling to a production quantity is a plain multiplication.
+    """
+    boms = list({d for d in boms if d})
+    if not boms:
+        return {}
+
+    versions = get_bom_versions(boms)
+    bom_lines = {}
+    missing = []
+    for bom, version in versions.items():
+        cached = frappe.cache().hget(BOM_LINES_CACHE_KEY, bom)
+        if cached and cached.get("version") == version:
+            bom_lines[bom] = cached["lines"]
+        else:
+            missing.append(bom)
+
+    if not missing:
+        return bom_lines
+
+    rows = frappe.db.sql("""
+        SELECT
+            bom.name AS bom, bom_item.item_code, bom_item.item_name,
+            bom_item.description, bom_item.stock_uom, bom_item.rate, bom_item.conversion_factor,
+            bom_item.qty / bom.quantity AS qty_per_unit
+        FROM `tabBOM` bom
+        INNER JOIN `tabBOM Item` bom_item ON bom_item.parent = bom.name AND bom_item.parenttype = 'BOM'
+        WHERE bom.name IN %(boms)s AND bom.docstatus = 1
+        ORDER BY bom.name, bom_item.idx
+    """, {"boms": missing}, as_dict=1)
+
+    item_map = get_item_details_map([row.item_code for row in rows])
+    for row in rows:
+        details = item_map.get(row.item_code) or frappe._dict()
+        bom_lines.setdefault(row.bom, []).append(frappe._dict({
+            "item_code": row.item_code,
+            "item_name": details.item_name or row.item_name,
+            "description": row.description,
+            "stock_uom": details.stock_uom or row.stock_uom,
+            "rate": flt(row.rate),
+            "conversion_factor": flt(row.conversion_factor) or 1.0,
+            "qty_per_unit": flt(row.qty_per_unit)
+        }))
+
+    for bom in missing:
+        if bom in bom_lines:
+            frappe.cache().hset(BOM_LINES_CACHE_KEY, bom, {"version": versions[bom], "lines": bom_lines[bom]})
+
+    return bom_lines
+
+def get_bom_versions(boms):
+    """Latest change of each submitted BOM or any of its items, as a string"""
+    return {
+        bom: str(version)
+        for bom, version in frappe.db.sql("""
+            SELECT bom.name, GREATEST(bom.modified, COALESCE(MAX(bom_item.modified), bom.modified))
+            FROM `tabBOM` bom
+            LEFT JOIN `tabBOM Item` bom_item ON bom_item.parent = bom.name AND bom_item.parenttype = 'BOM'
+            WHERE bom.name IN %s AND bom.docstatus = 1
+            GROUP BY bom.name, bom.modified
+        """, (boms,))
+    }
+
+def clear_bom_lines_cache(doc, method=None):
+    """doc_events hook for BOM"""
+    frappe.cache().hdel(BOM_LINES_CACHE_KEY, doc.name)
+    # Workers that reloaded the lines before this transaction committed would
+    # otherwise cache the old version again
+    frappe.db.after_commit.add(lambda: frappe.cache().hdel(BOM_LINES_CACHE_KEY, doc.name))
+
+def percentile(values, q):
+    """Nearest-rank percentile of `values`, `q` between 0 and 100"""
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values), max(1, math.ceil(q / 100.0 * len(values)))) - 1]
@@ -0,0 +1,425 @@
+import frappe
+from datetime import datetime
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import cint, flt, get_datetime, get_time, getdate, now, now_datetime
+from erpnext.stock.doctype.rmc_production_entry.utils import (
+    SHIFT_PENDING_STATUS,
+    get_company_rmc_context,
+    get_conversion_factor,
+    get_item_details_map,
+    get_posting_schedule,
+    get_transfer_warehouses,
+    get_voucher_mode
+)
+
+class RMCShiftPosting(Document):
+    """Consolidated vouchers posted for one plant at shift close, with the tickets behind each"""
+    pass
+
+def on_doctype_update():
+    frappe.db.add_index("RMC Shift Posting", ["company", "plant", "shift_end"])
+
+@frappe.whitelist()
+def close_shift(company, plant=None, shift_end=None):
+    """Post every pending ticket produced up to `shift_end` in the background"""
+    frappe.only_for("Stock Manager")
+
+    frappe.enqueue(
+        run_shift_close,
+        queue="long",
+        timeout=3600,
+        job_id=f"rmc_shift_close::{company}::{plant or ''}",
+        deduplicate=True,
+        enqueue_after_commit=True,
+        company=company,
+        plant=plant,
+        shift_end=shift_end or now()
+    )
+
+def close_due_shifts():
+    """Hourly job: close shifts at the hours listed in the `rmc_shift_close_hours` site config"""
+    if get_posting_schedule() != "Shift":
+        return
+
+    if now_datetime().hour not in [cint(hour) for hour in frappe.conf.get("rmc_shift_close_hours") or []]:
+        return
+
+    shift_end = now()
+    for company, plant in frappe.db.sql("""
+        SELECT DISTINCT company, source_warehouse
+        FROM `tabRMC Production Entry`
+        WHERE docstatus = 1 AND posting_status = %s
+    """, SHIFT_PENDING_STATUS):
+        frappe.enqueue(
+            run_shift_close,
+            queue="long",
+            timeout=3600,
+            job_id=f"rmc_shift_close::{company}::{plant}",
+            deduplicate=True,
+            company=company,
+            plant=plant,
+            shift_end=shift_end
+        )
+
+def run_shift_close(company, plant=None, shift_end=None):
+    """Post the pending tickets of each plant, one plant per transaction"""
+    shift_end = shift_end or now()
+    filters = {"company": company, "docstatus": 1, "posting_status": SHIFT_PENDING_STATUS}
+    if plant:
+        filters["source_warehouse"] = plant
+
+    postings = []
+    for plant in frappe.get_all("RMC Production Entry", filters=filters, distinct=True, pluck="source_warehouse"):
+        try:
+            posting = post_plant_shift(company, plant, shift_end)
+            frappe.db.commit()
+            if posting:
+                postings.append(posting.name)
+        except Exception:
+            frappe.db.rollback()
+            frappe.log_error(title=f"RMC shift close failed for {plant}")
+
+    return postings
+
+def post_plant_shift(company, plant, shift_end):
+    """Post the pending tickets of a plant as consolidated vouchers.
+
+    Vouchers are grouped by production date, so each is posted on the date of
+    its tickets, at the latest ticket's time. Within a date there is one
+    production voucher per grade (and BOM, in Manufacture mode), one mixing
+    Journal Entry per grade, and one transfer per grade and movement. A
+    transfer is posted when its tickets moved, but never before the voucher
+    that last moved them, so stock always arrives before it leaves.
+    """
+    entries = frappe.db.sql("""
+        SELECT
+            name, production_date, posting_time, rmc_grade, bom, quantity, per_unit_cost,
+            total_mixing_cost, production_cost, source_warehouse, destination_warehouse
+        FROM `tabRMC Production Entry`
+        WHERE company = %s AND source_warehouse = %s AND docstatus = 1 AND posting_status = %s
+            AND TIMESTAMP(production_date, posting_time) <= %s
+        ORDER BY production_date, posting_time, name
+        FOR UPDATE
+    """, (company, plant, SHIFT_PENDING_STATUS, shift_end), as_dict=1)
+    if not entries:
+        return
+
+    names = [d.name for d in entries]
+    entry_map = {d.name: d for d in entries}
+
+    materials = {}
+    for row in frappe.db.sql("""
+        SELECT parent, item_code, qty, uom
+        FROM `tabRMC Raw Materials`
+        WHERE parenttype = 'RMC Production Entry' AND parent IN %s
+    """, (names,), as_dict=1):
+        materials.setdefault(row.parent, []).append(row)
+
+    # State changes made while the shift was open, still without a Stock Entry
+    transitions = frappe.db.sql("""
+        SELECT name, rmc_production_entry, to_state, transitioned_at
+        FROM `tabRMC Status Transition`
+        WHERE rmc_production_entry IN %s AND stock_entry IS NULL
+        FOR UPDATE
+    """, (names,), as_dict=1)
+
+    item_map = get_item_details_map(
+        [d.rmc_grade for d in entries] + [row.item_code for rows in materials.values() for row in rows]
+    )
+    context = get_company_rmc_context(company)
+    voucher_mode = get_voucher_mode()
+
+    posting = frappe.new_doc("RMC Shift Posting")
+    posting.update({
+        "company": company,
+        "plant": plant,
+        "shift_end": shift_end,
+        "voucher_mode": voucher_mode,
+        "ticket_count": len(entries),
+        "total_quantity": sum(flt(d.quantity) for d in entries)
+    })
+
+    def add_voucher(movement, voucher, tickets):
+        for d in tickets:
+            posting.append("vouchers", {
+                "rmc_production_entry": d.name,
+                "movement": movement,
+                "voucher_type": voucher.doctype,
+                "voucher_no": voucher.name
+            })
+
+    # Transition log rows to stamp with the voucher that now carries them
+    transition_vouchers = {}
+    # Posting time of the voucher that last moved each ticket
+    posted_at = {}
+
+    for production_date, day_entries in group_by(entries, lambda d: d.production_date).items():
+        production_at = datetime.combine(
+            getdate(production_date), max(get_time(d.posting_time) for d in day_entries)
+        )
+        posting_fields = get_posting_fields(production_at)
+        posted_at.update((d.name, production_at) for d in day_entries)
+
+        if voucher_mode == "Manufacture":
+            groups = group_by(day_entries, lambda d: (d.rmc_grade, d.bom))
+        else:
+            groups = group_by(day_entries, lambda d: d.rmc_grade)
+
+        for group in groups.values():
+            grade = group[0].rmc_grade
+            if voucher_mode == "Manufacture":
+                production_voucher = make_manufacture_entry(
+                    company, plant, grade, group, materials, item_map, context, **posting_fields
+                )
+                add_voucher("Manufacture", production_voucher, group)
+            else:
+                issue = make_material_issue(company, plant, group, materials, item_map, context, **posting_fields)
+                add_voucher("Material Issue", issue, group)
+                production_voucher = make_material_receipt(
+                    company, plant, grade, group, item_map, context, **posting_fields
+                )
+                add_voucher("Material Receipt", production_voucher, group)
+
+                # Per grade, so cancelling a ticket only touches the charges of its grade
+                charged = [d for d in group if flt(d.total_mixing_cost)]
+                if charged:
+                    journal_entry = make_mixing_journal_entry(company, charged, context, production_date)
+                    add_voucher("Mixing Charges", journal_entry, charged)
+
+            tickets = {d.name for d in group}
+            for row in transitions:
+                if row.to_state == "Produced" and row.rmc_production_entry in tickets:
+                    transition_vouchers[row.name] = production_voucher.name
+
+    for status in ("In-Transit", "Delivered"):
+        rows = [row for row in transitions if row.to_state == status]
+        # Transfers are posted on the date and time the tickets moved
+        for _transition_date, day_rows in group_by(rows, lambda d: getdate(d.transitioned_at)).items():
+            moved = [entry_map[row.rmc_production_entry] for row in day_rows]
+            for grade, group in group_by(moved, lambda d: d.rmc_grade).items():
+                tickets = {d.name for d in group}
+                group_rows = [row for row in day_rows if row.rmc_production_entry in tickets]
+                transfer_at = get_transfer_posted_at(group_rows, posted_at)
+
+                transfer = make_shift_transfer(
+                    company, grade, status, group, item_map, context, **get_posting_fields(transfer_at)
+                )
+                add_voucher(status, transfer, group)
+
+                for row in group_rows:
+                    transition_vouchers[row.name] = transfer.name
+                    posted_at[row.rmc_production_entry] = transfer_at
+
+    posting.posted_on = now()
+    posting.insert(ignore_permissions=True)
+
+    if transition_vouchers:
+        cases = " ".join(["WHEN %s THEN %s"] * len(transition_vouchers))
+        frappe.db.sql(f"""
+            UPDATE `tabRMC Status Transition`
+            SET stock_entry = CASE name {cases} END
+            WHERE name IN %s
+        """, (
+            *[value for item in transition_vouchers.items() for value in item],
+            list(transition_vouchers)
+        ))
+
+    frappe.db.sql("""
+        UPDATE `tabRMC Production Entry`
+        SET posting_status = 'Posted', posting_error = NULL
+        WHERE name IN %s
+    """, (names,))
+
+    return posting
+
+def group_by(rows, key):
+    groups = {}
+    for row in rows:
+        groups.setdefault(key(row), []).append(row)
+    return groups
+
+def get_posting_fields(posted_at):
+    """Back-date a voucher to `posted_at` instead of the shift close"""
+    posted_at = get_datetime(posted_at)
+    return {
+        "set_posting_time": 1,
+        "posting_date": posted_at.date(),
+        "posting_time": posted_at.time()
+    }
+
+def get_transfer_posted_at(transitions, posted_at):
+    """When a transfer is posted: the latest move of its tickets, but never
+    before the voucher that last moved any of them (`posted_at` by ticket)"""
+    return max(
+        [get_datetime(row.transitioned_at) for row in transitions]
+        + [posted_at[row.rmc_production_entry] for row in transitions if row.rmc_production_entry in posted_at]
+    )
+
+def get_remarks(entries):
+    return _("RMC Production Entries: {0}").format(", ".join(d.name for d in entries))
+
+def make_stock_entry(purpose, company, entries, items, **fields):
+    """Create and submit one Stock Entry carrying the movement of all `entries`"""
+    stock_entry = frappe.get_doc(dict({
+        "doctype": "Stock Entry",
+        "stock_entry_type": purpose,
+        "purpose": purpose,
+        "company": company,
+        "rmc_production_entry": entries[0].name if len(entries) == 1 else None,
+        "remarks": get_remarks(entries)
+    }, **fields))
+
+    for item in items:
+        stock_entry.append("items", item)
+
+    stock_entry.save()
+    stock_entry.submit()
+    return stock_entry
+
+def get_material_items(plant, entries, materials, item_map, context):
+    """Raw material rows of `entries`, summed per item and UOM"""
+    totals = {}
+    for entry in entries:
+        for row in materials.get(entry.name, []):
+            key = (row.item_code, row.uom)
+            totals[key] = totals.get(key, 0) + flt(row.qty)
+
+    items = []
+    for (item_code, uom), qty in totals.items():
+        details = item_map.get(item_code)
+        items.append({
+            "item_code": item_code,
+            "qty": qty,
+            "uom": uom,
+            "stock_uom": details.stock_uom if details else None,
+            "conversion_factor": get_conversion_factor(details, uom),
+            "s_warehouse": plant,
+            "cost_center": context.cost_center
+        })
+    return items
+
+def get_average_cost(entries):
+    quantity = sum(flt(d.quantity) for d in entries)
+    return sum(flt(d.per_unit_cost) * flt(d.quantity) for d in entries) / quantity if quantity else 0
+
+def make_material_issue(company, plant, entries, materials, item_map, context, **fields):
+    return make_stock_entry(
+        "Material Issue",
+        company,
+        entries,
+        get_material_items(plant, entries, materials, item_map, context),
+        from_warehouse=plant,
+        **fields
+    )
+
+def make_material_receipt(company, plant, grade, entries, item_map, context, **fields):
+    details = item_map.get(grade)
+    return make_stock_entry("Material Receipt", company, entries, [{
+        "item_code": grade,
+        "qty": sum(flt(d.quantity) for d in entries),
+        "stock_uom": details.stock_uom if details else None,
+        "conversion_factor": 1.0,
+        "t_warehouse": plant,
+        "cost_center": context.cost_center,
+        "basic_rate": get_average_cost(entries)
+    }], to_warehouse=plant, **fields)
+
+def make_manufacture_entry(company, plant, grade, entries, materials, item_map, context, **fields):
+    """One Manufacture entry for tickets of the same grade and BOM"""
+    details = item_map.get(grade)
+    quantity = sum(flt(d.quantity) for d in entries)
+
+    items = get_material_items(plant, entries, materials, item_map, context)
+    items.append({
+        "item_code": grade,
+        "qty": quantity,
+        "stock_uom": details.stock_uom if details else None,
+        "conversion_factor": 1.0,
+        "t_warehouse": plant,
+        "cost_center": context.cost_center,
+        "is_finished_item": 1
+    })
+
+    # Production cost is offset against stock adjustment, as in RMCProductionEntry.create_manufacture_entry
+    additional_costs = []
+    for description, amount, expense_account in (
+        (
+            _("Mixing charges for {0}").format(get_remarks(entries)),
+            sum(flt(d.total_mixing_cost) for d in entries),
+            context.mixing_expense_account
+        ),
+        (
+            _("Production cost for {0}").format(get_remarks(entries)),
+            sum(flt(d.production_cost) for d in entries),
+            context.stock_adjustment_account
+        )
+    ):
+        if flt(amount):
+            additional_costs.append({
+                "expense_account": expense_account,
+                "description": description,
+                "exchange_rate": 1,
+                "amount": flt(amount),
+                "base_amount": flt(amount)
+            })
+
+    return make_stock_entry(
+        "Manufacture",
+        company,
+        entries,
+        items,
+        from_bom=0,
+        bom_no=entries[0].bom,
+        fg_completed_qty=quantity,
+        from_warehouse=plant,
+        to_warehouse=plant,
+        additional_costs=additional_costs,
+        **fields
+    )
+
+def make_shift_transfer(company, grade, status, entries, item_map, context, **fields):
+    """One Material Transfer per grade and movement, with a row per source and target warehouse"""
+    details = item_map.get(grade)
+    items = []
+    for (source, target), group in group_by(entries, lambda d: get_transfer_warehouses(d, status)).items():
+        items.append({
+            "item_code": grade,
+            "qty": sum(flt(d.quantity) for d in group),
+            "stock_uom": details.stock_uom if details else None,
+            "conversion_factor": 1.0,
+            "s_warehouse": source,
+            "t_warehouse": target,
+            "cost_center": context.cost_center,
+            "basic_rate": get_average_cost(group)
+        })
+
+    return make_stock_entry("Material Transfer", company, entries, items, **fields)
+
+def make_mixing_journal_entry(company, entries, context, posting_date):
+    """One Journal Entry for the mixing charges of a grade's tickets on one production date"""
+    precision = frappe.get_precision("Journal Entry Account", "debit_in_account_currency")
+    amount = flt(sum(flt(d.total_mixing_cost, precision) for d in entries), precision)
+
+    journal_entry = frappe.get_doc({
+        "doctype": "Journal Entry",
+        "voucher_type": "Journal Entry",
+        "company": company,
+        "posting_date": posting_date,
+        "user_remark": _("Mixing charges for {0}").format(get_remarks(entries)),
+        "accounts": [
+            {
+                "account": context.cwip_account,
+                "debit_in_account_currency": amount,
+                "cost_center": context.cost_center
+            },
+            {
+                "account": context.mixing_expense_account,
+                "credit_in_account_currency": amount,
+                "cost_center": context.cost_center
+            }
+        ]
+    })
+    journal_entry.insert()
+    journal_entry.submit()
+    return journal_entry
@@ -0,0 +1,30 @@
+import frappe
+from datetime import datetime, time
+from frappe.tests.utils import FrappeTestCase
+from erpnext.stock.doctype.rmc_shift_posting.rmc_shift_posting import get_posting_fields, get_transfer_posted_at
+
+class TestRMCShiftPosting(FrappeTestCase):
+    def test_transfer_is_not_posted_before_production(self):
+        # Produced at 14:00, but the dispatch was recorded at 09:00 the same day
+        posted_at = {"RMC-PE-0001": datetime(2026, 10, 16, 14, 0)}
+        transitions = [
+            frappe._dict(rmc_production_entry="RMC-PE-0001", to_state="In-Transit",
+                transitioned_at="2026-10-16 09:00:00")
+        ]
+
+        posting_fields = get_posting_fields(get_transfer_posted_at(transitions, posted_at))
+
+        self.assertEqual(posting_fields["set_posting_time"], 1)
+        self.assertEqual(str(posting_fields["posting_date"]), "2026-10-16")
+        self.assertEqual(posting_fields["posting_time"], time(14, 0))
+
+    def test_transfer_is_posted_when_tickets_moved(self):
+        posted_at = {"RMC-PE-0001": datetime(2026, 10, 16, 8, 0), "RMC-PE-0002": datetime(2026, 10, 16, 8, 30)}
+        transitions = [
+            frappe._dict(rmc_production_entry="RMC-PE-0001", to_state="In-Transit",
+                transitioned_at="2026-10-16 09:00:00"),
+            frappe._dict(rmc_production_entry="RMC-PE-0002", to_state="In-Transit",
+                transitioned_at="2026-10-16 09:45:00")
+        ]
+
+        self.assertEqual(get_transfer_posted_at(transitions, posted_at), datetime(2026, 10, 16, 9, 45))
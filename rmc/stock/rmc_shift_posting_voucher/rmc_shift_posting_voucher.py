@@ -0,0 +1,9 @@
+import frappe
+from frappe.model.document import Document
+
+class RMCShiftPostingVoucher(Document):
+    pass
+
+def on_doctype_update():
+    frappe.db.add_index("RMC Shift Posting Voucher", ["rmc_production_entry"])
+    frappe.db.add_index("RMC Shift Posting Voucher", ["voucher_no"])
@@ -0,0 +1,9 @@
+import frappe
+from frappe.model.document import Document
+
+class RMCStageTiming(Document):
+    """Hourly rollup of instrumented RMC stage timings"""
+    pass
+
+def on_doctype_update():
+    frappe.db.add_index("RMC Stage Timing", ["period_start", "stage"])
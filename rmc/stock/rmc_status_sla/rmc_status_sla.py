@@ -0,0 +1,58 @@
+import frappe
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import flt
+
+# Hours an entry may stay in a state before it is flagged, when no SLA is configured
+DEFAULT_ALERT_HOURS = {
+    "Produced": 2,
+    "In-Transit": 4
+}
+
+SLA_RULES_CACHE_KEY = "rmc_status_sla_rules"
+
+class RMCStatusSLA(Document):
+    def validate(self):
+        if flt(self.alert_hours) <= 0:
+            frappe.throw(_("Alert After (Hours) must be greater than zero"))
+        self.validate_duplicate()
+
+    def validate_duplicate(self):
+        """Allow one SLA per company, plant and status"""
+        duplicate = frappe.db.get_value("RMC Status SLA", {
+            "company": self.company,
+            "warehouse": self.warehouse or ("is", "not set"),
+            "workflow_state": self.workflow_state,
+            "name": ("!=", self.name)
+        })
+        if duplicate:
+            frappe.throw(_("SLA {0} already exists for this company, plant and status").format(duplicate))
+
+    def on_update(self):
+        clear_sla_rules_cache()
+
+    def on_trash(self):
+        clear_sla_rules_cache()
+
+def get_sla_rules():
+    """Enabled SLAs as {(workflow_state, company, warehouse or None): alert_hours}"""
+    def load_rules():
+        rules = frappe.get_all(
+            "RMC Status SLA",
+            filters={"disabled": 0},
+            fields=["workflow_state", "company", "warehouse", "alert_hours"]
+        )
+        return {(d.workflow_state, d.company, d.warehouse or None): flt(d.alert_hours) for d in rules}
+
+    return frappe.cache().get_value(SLA_RULES_CACHE_KEY, generator=load_rules)
+
+def get_alert_hours(workflow_state, company=None, warehouse=None, rules=None):
+    """Alert threshold for a state: plant SLA, then company SLA, then the default"""
+    rules = get_sla_rules() if rules is None else rules
+    for key in ((workflow_state, company, warehouse), (workflow_state, company, None)):
+        if key in rules:
+            return rules[key]
+    return DEFAULT_ALERT_HOURS.get(workflow_state)
+
+def clear_sla_rules_cache():
+    frappe.cache().delete_value(SLA_RULES_CACHE_KEY)
@@ -0,0 +1,95 @@
+import frappe
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import now
+
+# Columns cycle times can be grouped by
+CYCLE_TIME_GROUPS = {
+    "plant": "plant",
+    "rmc_grade": "rmc_grade",
+    "lorry_number": "lorry_number"
+}
+
+class RMCStatusTransition(Document):
+    """Append-only log of RMC Production Entry workflow state changes"""
+    pass
+
+def on_doctype_update():
+    frappe.db.add_index("RMC Status Transition", ["rmc_production_entry", "to_state"])
+    frappe.db.add_index("RMC Status Transition", ["to_state", "transitioned_at"])
+    frappe.db.add_index("RMC Status Transition", ["stock_entry"])
+
+def log_transitions(entries, from_state, to_state, transitioned_at, stock_entries=None):
+    """Record state changes in the caller's transaction with one multi-row INSERT.
+
+    `stock_entries` maps entry names to the Stock Entry created for the move.
+    """
+    if not entries:
+        return
+
+    stock_entries = stock_entries or {}
+    timestamp = now()
+    user = frappe.session.user
+    fields = [
+        "name", "creation", "modified", "owner", "modified_by", "docstatus", "idx",
+        "rmc_production_entry", "from_state", "to_state", "transitioned_at", "user",
+        "stock_entry", "company", "plant", "rmc_grade", "lorry_number"
+    ]
+    frappe.db.bulk_insert("RMC Status Transition", fields, [
+        (
+            frappe.generate_hash(length=10), timestamp, timestamp, user, user, 0, 0,
+            entry.name, from_state, to_state, transitioned_at, user,
+            stock_entries.get(entry.name), entry.company, entry.source_warehouse,
+            entry.rmc_grade, entry.get("lorry_number")
+        )
+        for entry in entries
+    ])
+
+@frappe.whitelist()
+def get_cycle_time_percentiles(group_by="plant", from_state="Produced", to_state="Delivered",
+        from_date=None, to_date=None, company=None):
+    """Cycle time percentiles in hours between two states, per plant, grade or lorry.
+
+    Computed in one SQL aggregate over the transition log; `from_date` and
+    `to_date` filter on when the entry reached `to_state`.
+    """
+    frappe.has_permission("RMC Status Transition", "read", throw=True)
+
+    if group_by not in CYCLE_TIME_GROUPS:
+        frappe.throw(_("Cycle times can only be grouped by {0}").format(", ".join(CYCLE_TIME_GROUPS)))
+
+    conditions = ""
+    values = {"from_state": from_state, "to_state": to_state}
+    if from_date:
+        conditions += " AND finish.transitioned_at >= %(from_date)s"
+        values["from_date"] = from_date
+    if to_date:
+        conditions += " AND finish.transitioned_at < DATE_ADD(%(to_date)s, INTERVAL 1 DAY)"
+        values["to_date"] = to_date
+    if company:
+        conditions += " AND finish.company = %(company)s"
+        values["company"] = company
+
+    return frappe.db.sql(f"""
+        SELECT DISTINCT
+            group_value AS `{group_by}`,
+            COUNT(*) OVER (PARTITION BY group_value) AS entries,
+            AVG(hours) OVER (PARTITION BY group_value) AS avg_hours,
+            PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY hours) OVER (PARTITION BY group_value) AS p50,
+            PERCENTILE_CONT(0.9) WITHIN GROUP (ORDER BY hours) OVER (PARTITION BY group_value) AS p90,
+            PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY hours) OVER (PARTITION BY group_value) AS p95,
+            MAX(hours) OVER (PARTITION BY group_value) AS max_hours
+        FROM (
+            SELECT
+                finish.{CYCLE_TIME_GROUPS[group_by]} AS group_value,
+                TIMESTAMPDIFF(SECOND, start.transitioned_at, finish.transitioned_at) / 3600 AS hours
+            FROM `tabRMC Status Transition` finish
+            INNER JOIN `tabRMC Status Transition` start
+                ON start.rmc_production_entry = finish.rmc_production_entry
+                AND start.to_state = %(from_state)s
+            INNER JOIN `tabRMC Production Entry` entry
+                ON entry.name = finish.rmc_production_entry AND entry.docstatus = 1
+            WHERE finish.to_state = %(to_state)s {conditions}
+        ) cycles
+        ORDER BY group_value
+    """, values, as_dict=1)